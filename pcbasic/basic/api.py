@@ -117,6 +117,33 @@ class Session(object):
             raise ValueError('Sigil must be explicit')
         return self._impl.get_variable(name, as_type)
 
+    def view_array(self, name):
+        """Get a view of an array's memory, with its shape and base; None if not allocated."""
+        self.start()
+        if isinstance(name, text_type):
+            name = name.encode('ascii')
+        if name.split(b'(')[0][-1:] not in SIGILS:
+            raise ValueError('Sigil must be explicit')
+        return self._impl.view_array(name)
+
+    def get_array(self, name):
+        """Get all elements of an array as a flat list."""
+        self.start()
+        if isinstance(name, text_type):
+            name = name.encode('ascii')
+        if name.split(b'(')[0][-1:] not in SIGILS:
+            raise ValueError('Sigil must be explicit')
+        return self._impl.get_array(name)
+
+    def set_array(self, name, value, shape=None):
+        """Set all elements of an array from a flat list."""
+        self.start()
+        if isinstance(name, text_type):
+            name = name.encode('ascii')
+        if name.split(b'(')[0][-1:] not in SIGILS:
+            raise ValueError('Sigil must be explicit')
+        self._impl.set_array(name, value, shape)
+
     def convert(self, value, to_type):
         """Convert a Python value to another type, consistent with BASIC rules."""
         self.start()
@@ -137,6 +164,25 @@ class Session(object):
         self.start()
         return self._impl.display.vpage.pixels[:, :].to_rows()
 
+    def get_profile(self, as_type=dict):
+        """Get execution profile as dict or as 'report', 'json' or 'collapsed' text; None if not profiling."""
+        self.start()
+        profiler = self._impl.profiler
+        if not profiler:
+            return None
+        if as_type == dict:
+            return profiler.get_stats()
+        return {
+            'report': profiler.get_report,
+            'json': profiler.get_json,
+            'collapsed': profiler.get_collapsed,
+        }[as_type]()
+
+    def get_garbage_stats(self):
+        """Get string space garbage collection counters as dict."""
+        self.start()
+        return self._impl.memory.get_garbage_stats()
+
     def greet(self):
         """Emit the interpreter greeting and show the key bar."""
         self.start()
@@ -7,13 +7,26 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 from functools import partial
-import io
+import re
+
+from ...compat import int2byte
 
 from . import error
 from . import tokens as tk
 from .tokens import DIGITS, HEXDIGITS, OCTDIGITS, LETTERS
 
 
+# single-byte strings by value
+BYTES = tuple(int2byte(_i) for _i in range(256))
+
+# search functions for TokenisedStream.skip_to, by find range
+_SKIP_SEARCH = {}
+# end of string literal or of comment
+_find_literal_end = re.compile(b'["\0' + re.escape(tk.REM) + b']').search
+_find_rem_end = re.compile(b'\0').search
+_QUOTE, _REM = ord(b'"'), ord(tk.REM)
+
+
 class StreamWrapper(object):
     """Base class for delegated stream wrappers."""
 
@@ -30,7 +43,7 @@ class StreamWrapper(object):
             raise AttributeError()
 
 
-class CodeStream(StreamWrapper):
+class CodeStream(object):
     """Stream of various kinds of code."""
 
     # whitespace
@@ -40,23 +53,82 @@ class CodeStream(StreamWrapper):
 
     def __init__(self, bytesbuffer):
         """Initialise the stream."""
-        self._buffer = bytesbuffer
-        # we need delegation rather than inheritance to allow pickling under Python 2
-        StreamWrapper.__init__(self, io.BytesIO(bytesbuffer))
+        # we keep our own buffer and cursor rather than wrap a BytesIO,
+        # as reads on the interpreter's hot path are mostly of single bytes
+        self._buffer = bytearray(bytesbuffer)
+        self._pos = 0
+
+    def read(self, n=-1):
+        """Read n bytes, or all remaining bytes."""
+        pos = self._pos
+        if n == 1:
+            try:
+                char = BYTES[self._buffer[pos]]
+            except IndexError:
+                return b''
+            self._pos = pos + 1
+            return char
+        end = len(self._buffer) if n is None or n < 0 else pos + n
+        data = bytes(self._buffer[pos:end])
+        self._pos = pos + len(data)
+        return data
+
+    def write(self, data):
+        """Write bytes at the current position, overwriting and extending as needed."""
+        pos = self._pos
+        if pos > len(self._buffer):
+            self._buffer.extend(bytearray(pos - len(self._buffer)))
+        self._buffer[pos:pos+len(data)] = data
+        self._pos = pos + len(data)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        """Move to an absolute position, or relative to the current position or the end."""
+        if whence == 0:
+            if offset < 0:
+                raise ValueError('negative seek value %d' % (offset,))
+            self._pos = offset
+        elif whence == 1:
+            self._pos = max(0, self._pos + offset)
+        else:
+            self._pos = max(0, len(self._buffer) + offset)
+        return self._pos
+
+    def tell(self):
+        """Current position."""
+        return self._pos
+
+    def truncate(self, size=None):
+        """Cut off the stream at the current or given position; position does not move."""
+        if size is None:
+            size = self._pos
+        del self._buffer[size:]
+        return size
+
+    def getvalue(self):
+        """Contents of the stream."""
+        return bytes(self._buffer)
 
     def peek(self, n=1):
         """Peek next char in stream."""
-        d = self.read(n)
-        self.seek(-len(d), 1)
-        return d
+        if n == 1:
+            try:
+                return BYTES[self._buffer[self._pos]]
+            except IndexError:
+                return b''
+        return bytes(self._buffer[self._pos:self._pos+n])
 
     def skip_read(self, skip_range, n=1):
         """Skip chars in skip_range, then read next."""
-        while True:
-            d = self.read(1)
-            # skip_range must not include ''
-            if d == b'' or d not in skip_range:
-                return d + self.read(n-1)
+        # skip_range must not include ''
+        buf, pos = self._buffer, self._pos
+        try:
+            while BYTES[buf[pos]] in skip_range:
+                pos += 1
+        except IndexError:
+            pass
+        self._pos = pos
+        return self.read(n)
 
     def skip_blank_read(self, n=1):
         """Skip whitespace, then read next."""
@@ -64,9 +136,14 @@ class CodeStream(StreamWrapper):
 
     def skip_blank(self, n=1):
         """Skip whitespace, then peek next."""
-        d = self.skip_read(self.blanks, n)
-        self.seek(-len(d), 1)
-        return d
+        buf, pos = self._buffer, self._pos
+        try:
+            while BYTES[buf[pos]] in self.blanks:
+                pos += 1
+        except IndexError:
+            pass
+        self._pos = pos
+        return self.peek(n)
 
     def backskip_blank(self):
         """Skip whitespace backwards, then peek next."""
@@ -90,15 +167,14 @@ class CodeStream(StreamWrapper):
 
     def read_to(self, findrange):
         """Read until a character from a given range is found."""
-        out = b''
-        while True:
-            d = self.read(1)
-            if d == b'':
-                break
-            if d in findrange:
-                break
-            out += d
-        self.seek(-len(d), 1)
+        buf, pos = self._buffer, self._pos
+        try:
+            while BYTES[buf[pos]] not in findrange:
+                pos += 1
+        except IndexError:
+            pass
+        out = bytes(buf[self._pos:pos])
+        self._pos = pos
         return out
 
     def require_read(self, in_range, err=error.STX):
@@ -267,37 +343,65 @@ class TokenisedStream(CodeStream):
 
     def skip_to(self, findrange, break_on_first_char=True):
         """Skip until character is in findrange."""
-        literal = False
-        rem = False
+        buf, pos = self._buffer, self._pos
+        if pos >= len(buf):
+            return
         nchars = len(findrange[0])
+        try:
+            find_next = _SKIP_SEARCH[findrange]
+        except KeyError:
+            # statement-level characters that need a closer look: anything else is skipped
+            specials = set(_item[:1] for _item in findrange if _item)
+            specials.update((b'"', tk.REM, b'\0'), tk.PLUS_BYTES)
+            find_next = _SKIP_SEARCH[findrange] = re.compile(
+                b'[' + b''.join(re.escape(_c) for _c in specials) + b']'
+            ).search
+        literal, rem = False, False
         while True:
-            c = self.read(1)
-            if c == b'':
-                break
-            elif c == b'"':
-                literal = not literal
-            elif c == tk.REM:
-                rem = True
-            elif c == b'\0':
-                literal = False
-                rem = False
             if literal or rem:
-                continue
-            if c + self.peek(nchars-1) in findrange:
-                if break_on_first_char:
-                    self.seek(-1, 1)
+                match = (_find_rem_end if rem else _find_literal_end)(buf, pos)
+                if not match:
+                    pos = len(buf)
                     break
-            break_on_first_char = True
+                pos = match.start()
+                c = buf[pos]
+                if c == _REM:
+                    rem = True
+                    pos += 1
+                    continue
+                # closing quote or line end are processed below
+                literal, rem = False, False
+            else:
+                match = find_next(buf, pos)
+                if not match:
+                    pos = len(buf)
+                    break
+                if match.start() > pos:
+                    break_on_first_char = True
+                pos = match.start()
+                c = buf[pos]
+                if c == _QUOTE:
+                    literal = True
+                    pos += 1
+                    continue
+                elif c == _REM:
+                    rem = True
+                    pos += 1
+                    continue
+            if break_on_first_char and bytes(buf[pos:pos+nchars]) in findrange:
+                break
             # not elif! if not break_on_first_char, c needs to be properly processed.
-            if c == b'\0':
+            break_on_first_char = True
+            if c == 0:
                 # offset and line number follow
-                literal = False
-                off = self.read(2)
+                off = buf[pos+1:pos+3]
                 if len(off) < 2 or off == b'\0\0':
+                    pos += 1 + len(off)
                     break
-                self.read(2)
-            elif c in tk.PLUS_BYTES:
-                self.read(tk.PLUS_BYTES[c])
+                pos += 5
+            else:
+                pos += 1 + tk.PLUS_BYTES.get(BYTES[c], 0)
+        self._pos = min(pos, len(buf))
 
     def skip_to_read(self, findrange):
         """Skip until character is in findrange, then read."""
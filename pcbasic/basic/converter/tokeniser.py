@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import struct
+import re
 import io
 
 from ..base import tokens as tk
@@ -15,6 +16,10 @@ from ..base import codestream
 from .. import values
 
 
+# run of characters allowed in names: letters, digits and .
+NAME_RUN = re.compile(b'[' + re.escape(tk.NAME_CHARS) + b']*')
+
+
 class PlainTextStream(codestream.CodeStream):
     """Stream of plain-text BASIC code."""
 
@@ -49,6 +54,13 @@ class PlainTextStream(codestream.CodeStream):
             return int(word)
         return None
 
+    def read_name_chars(self):
+        """Read a run of name characters, as is."""
+        start = self.tell()
+        end = NAME_RUN.match(self._buffer, start).end()
+        self.seek(end)
+        return bytes(self._buffer[start:end])
+
 
 class Tokeniser(object):
     """BASIC tokeniser."""
@@ -60,6 +72,9 @@ class Tokeniser(object):
         tk.KW_DELETE, tk.KW_RUN, tk.KW_RESUME, tk.KW_AUTO,
         tk.KW_ERL, tk.KW_RESTORE, tk.KW_RETURN)
 
+    # keywords that are recognised when followed by name characters
+    _prefix_words = (tk.KW_FN, tk.KW_SPC, tk.KW_TAB, tk.KW_USR)
+
     # operator symbols
     _ascii_operators = b'+-=/\\^*<>'
 
@@ -215,52 +230,51 @@ class Tokeniser(object):
 
     def _tokenise_word(self, ins, outs):
         """Convert a keyword or name to tokenised form."""
-        word = b''
-        while True:
-            c = ins.read(1)
-            word += c.upper()
-            if word == b'GO':
-                # deal with special cases 'GO     TO' -> 'GOTO', 'GO SUB' -> 'GOSUB'
-                word, allow_name_chars = self._tokenise_wide_goto_gosub(ins)
+        # keywords are only recognised as a whole name, so read it in one go and look it up
+        word = ins.read_name_chars().upper()
+        if word == b'GO':
+            # deal with special cases 'GO     TO' -> 'GOTO', 'GO SUB' -> 'GOSUB'
+            word = self._tokenise_wide_goto_gosub(ins)
+        elif word not in self._keyword_to_token:
+            for keyword in self._prefix_words:
+                # FN and USR are recognised even if part of a longer name
+                if word.startswith(keyword):
+                    ins.seek(len(keyword) - len(word), 1)
+                    word = keyword
+                    break
             else:
-                allow_name_chars = False
-            if word in self._keyword_to_token:
-                # ignore if part of a longer name, except FN, SPC(, TAB(, USR, GO SUB and GO   TO
-                if word not in (tk.KW_FN, tk.KW_SPC, tk.KW_TAB, tk.KW_USR) and not allow_name_chars:
+                # keywords can end in a $ or (, e.g. CHR$, SPC(
+                c = ins.read(1)
+                if c and word + c in self._keyword_to_token:
+                    word += c
+                    # ignore if part of a longer name, except SPC( and TAB(
                     nxt = ins.peek()
-                    if nxt and nxt in tk.NAME_CHARS:
-                        continue
-                token = self._keyword_to_token[word]
-                # handle special case ELSE -> :ELSE
-                if word == tk.KW_ELSE:
-                    outs.write(b':' + token)
-                # handle special case WHILE -> WHILE+
-                elif word == tk.KW_WHILE:
-                    outs.write(token + tk.O_PLUS)
+                    if word not in self._prefix_words and nxt and nxt in tk.NAME_CHARS:
+                        word += ins.read_name_chars().upper()
                 else:
-                    outs.write(token)
-                break
-            # allowed names: letter + (letters, numbers, .)
-            elif not c:
-                outs.write(word)
-                break
-            elif c not in tk.NAME_CHARS:
-                word = word[:-1]
-                ins.seek(-1, 1)
-                outs.write(word)
-                break
+                    ins.seek(-len(c), 1)
+        token = self._keyword_to_token.get(word)
+        # allowed names: letter + (letters, numbers, .)
+        if token is None:
+            outs.write(word)
+        # handle special case ELSE -> :ELSE
+        elif word == tk.KW_ELSE:
+            outs.write(b':' + token)
+        # handle special case WHILE -> WHILE+
+        elif word == tk.KW_WHILE:
+            outs.write(token + tk.O_PLUS)
+        else:
+            outs.write(token)
         return word
 
     def _tokenise_wide_goto_gosub(self, ins):
         """Special cases 'GO     TO' -> 'GOTO', 'GO SUB' -> 'GOSUB'."""
         word = b'GO'
-        allow_name_chars = False
         next_four = ins.peek(4).upper()
         # GO SUB allows 1 space, allows text after
         if next_four == b' SUB':
             word = tk.KW_GOSUB
             ins.read(4)
-            allow_name_chars = True
         # GO TO with single space, does not allow text or numbers after
         elif next_four[:3] == b' TO' and next_four[3:4] not in tk.NAME_CHARS:
             word = tk.KW_GOTO
@@ -274,10 +288,9 @@ class Tokeniser(object):
             next_two = ins.read(2).upper()
             if next_two == b'TO':
                 word = tk.KW_GOTO
-                allow_name_chars = True
             else:
                 ins.seek(pos)
-        return word, allow_name_chars
+        return word
 
     def _tokenise_number(self, ins):
         """Convert Python-string number representation to number token."""
@@ -98,7 +98,8 @@ class DebugSession(api.Session):
             api.Session.start(self)
             # register as an extension
             self._impl.extensions.add(self)
-            # replace dummy debugging step
+            # replace debugging step, keeping any existing step such as the profiler's
+            self._step = self._impl.interpreter.step
             self._impl.interpreter.step = self._debug_step
             self._do_trace = False
             self._watch_list = []
@@ -125,6 +126,7 @@ class DebugSession(api.Session):
                 self._handle_exception(e)
         if outstr:
             logging.debug(outstr)
+        self._step(token)
 
     def _handle_exception(self, e):
         """Handle exception during debugging."""
@@ -6,12 +6,18 @@ Formatted output handling
 This file is released under the GNU GPL version 3 or later.
 """
 
+from collections import OrderedDict
+
 from ..base import codestream
 from ..base import error
 from ..base import tokens as tk
 from .. import values
 
 
+# number of compiled PRINT USING format strings to keep
+USING_CACHE_SIZE = 64
+
+
 class Formatter(object):
     """Output string formatter."""
 
@@ -82,39 +88,20 @@ class Formatter(object):
         format_expr = values.next_string(args)
         if format_expr == b'':
             raise error.BASICError(error.IFC)
-        fors = codestream.CodeStream(format_expr)
+        plan = _get_using_plan(format_expr)
         newline, format_chars = True, False
-        start_cycle = True
-        initial_literal = b''
         try:
             while True:
-                c = fors.peek()
-                if c == b'':
-                    if not format_chars:
-                        # avoid infinite loop
-                        break
-                    # loop the format string if more variables to come
-                    start_cycle = True
-                    initial_literal = b''
-                    fors.seek(0)
-                elif c == b'_':
-                    # escape char; write next char in fors or _ if this is the last char
-                    if start_cycle:
-                        initial_literal += fors.read(2)[-1:]
-                    else:
-                        self._output.write(fors.read(2)[-1:])
-                else:
-                    try:
-                        format_field = StringField(fors)
-                    except ValueError:
-                        try:
-                            format_field = NumberField(fors)
-                        except ValueError:
-                            if start_cycle:
-                                initial_literal += fors.read(1)
-                            else:
-                                self._output.write(fors.read(1))
-                            continue
+                # loop the format string if more variables to come
+                start_cycle = True
+                initial_literal = b''
+                for item in plan:
+                    if isinstance(item, bytes):
+                        if start_cycle:
+                            initial_literal += item
+                        else:
+                            self._output.write(item)
+                        continue
                     format_chars = True
                     value = next(args)
                     if value is None:
@@ -123,7 +110,10 @@ class Formatter(object):
                     if start_cycle:
                         self._output.write(initial_literal)
                         start_cycle = False
-                    self._output.write(format_field.format(value))
+                    self._output.write(item.format(value))
+                # avoid infinite loop
+                if not newline or not format_chars:
+                    break
             # consume any remaining arguments / finish parser
             list(args)
         except StopIteration:
@@ -138,6 +128,40 @@ class Formatter(object):
 ##############################################################################
 # formatting functions and format string parsers
 
+_using_cache = OrderedDict()
+
+def _get_using_plan(format_expr):
+    """Get the compiled PRINT USING format string, from the cache if possible."""
+    try:
+        plan = _using_cache.pop(format_expr)
+    except KeyError:
+        plan = _compile_using(format_expr)
+    # most recently used go last
+    _using_cache[format_expr] = plan
+    if len(_using_cache) > USING_CACHE_SIZE:
+        _using_cache.popitem(last=False)
+    return plan
+
+def _compile_using(format_expr):
+    """Parse a PRINT USING format string into format fields and single literal characters."""
+    fors = codestream.CodeStream(format_expr)
+    plan = []
+    while True:
+        c = fors.peek()
+        if c == b'':
+            return tuple(plan)
+        elif c == b'_':
+            # escape char; next char in fors or _ if this is the last char
+            plan.append(fors.read(2)[-1:])
+        else:
+            try:
+                plan.append(StringField(fors))
+            except ValueError:
+                try:
+                    plan.append(NumberField(fors))
+                except ValueError:
+                    plan.append(fors.read(1))
+
 class StringField(object):
     """String Formatter for PRINT USING."""
 
@@ -78,6 +78,33 @@ class NullQueue(object):
         pass
 
 
+class PollPolicy(object):
+    """Decide when the interpreter checks for events between statements."""
+
+    def __init__(self, statements=1, milliseconds=0):
+        """Poll every given number of statements or milliseconds, whichever comes first."""
+        self._statements = max(1, statements or 1)
+        # zero means no time limit
+        self._interval = max(0, milliseconds or 0) / 1000.
+        self._count = 0
+        self._last = time.time()
+
+    def due(self, queues):
+        """Return whether events need to be checked before the next statement."""
+        self._count += 1
+        # poll immediately if BASIC events are trapped or there is input (e.g. Break) waiting
+        if (
+                self._count < self._statements and not queues.has_basic_handlers()
+                and queues.inputs.empty()
+                and not (self._interval and time.time() - self._last >= self._interval)
+            ):
+            return False
+        self._count = 0
+        if self._interval:
+            self._last = time.time()
+        return True
+
+
 class EventQueues(object):
     """Manage interface queues."""
 
@@ -85,7 +112,7 @@ class EventQueues(object):
     max_video_qsize = 500
     max_audio_qsize = 20
 
-    def __init__(self, ctrl_c_is_break, inputs=None, video=None, audio=None):
+    def __init__(self, ctrl_c_is_break, inputs=None, video=None, audio=None, poll_interval=(1, 0)):
         """Initialise; default is NullQueues."""
         # input signal handlers
         self._handlers = []
@@ -97,6 +124,8 @@ class EventQueues(object):
         self._ctrl_c_is_break = ctrl_c_is_break
         # F12 replacement events
         self._f12_active = False
+        # how often to check events between statements
+        self._poll_policy = PollPolicy(*poll_interval)
         self.set(inputs, video, audio)
 
     def set(self, inputs=None, video=None, audio=None):
@@ -126,11 +155,20 @@ class EventQueues(object):
         """Set the handlers for BASIC events."""
         self._basic_handlers = tuple(event_check_input)
 
+    def has_basic_handlers(self):
+        """BASIC events are being trapped."""
+        return bool(self._basic_handlers)
+
     def wait(self):
         """Wait and check events."""
         time.sleep(self.tick)
         self.check_events()
 
+    def poll(self):
+        """Check events between statements, if due according to the polling policy."""
+        if self._poll_policy.due(self):
+            self.check_events()
+
     def check_events(self):
         """Main event cycle."""
         # sleep(0) is needed for responsiveness, e.g. even trapping in programs with tight loops
@@ -25,6 +25,7 @@ from . import converter
 from . import eventcycle
 from . import basicevents
 from . import program
+from . import programcache
 from . import display
 from . import console
 from . import inputs
@@ -39,6 +40,7 @@ from . import codepage as cp
 from . import values
 from . import parser
 from . import extensions
+from . import profiler
 
 
 GREETING = (
@@ -51,7 +53,7 @@ class Implementation(object):
     """Interpreter session, implementation class."""
 
     def __init__(
-            self, syntax=u'advanced', double=False, term=u'', shell=u'',
+            self, syntax=u'advanced', double=False, fast_math=False, term=u'', shell=u'',
             output_streams=u'stdio', input_streams=u'stdio',
             codepage=None, box_protect=True, font=None, text_width=80,
             video=u'cga', monitor=u'rgb',
@@ -62,7 +64,8 @@ class Implementation(object):
             peek_values=None, allow_code_poke=False, rebuild_offsets=True,
             max_memory=65534, reserved_memory=3429, video_memory=262144,
             serial_buffer_size=128, max_reclen=128, max_files=3,
-            extension=(), enabled_writes=[]
+            extension=(), enabled_writes=[], event_poll_interval=(1, 0),
+            profile=False, program_cache=None, program_cache_size=16384
         ):
         """Initialise the interpreter session."""
         
@@ -100,9 +103,15 @@ class Implementation(object):
         self.lister = converter.Lister(self.values, token_keyword)
         # initialise the program
         bytecode = codestream.TokenisedStream(self.memory.code_start)
+        if program_cache:
+            # cached tokenised programs depend on the version and the keywords
+            program_cache = programcache.ProgramCache(
+                program_cache, program_cache_size * 1024,
+                b'%s %s' % (VERSION.encode('ascii'), syntax.encode('ascii'))
+            )
         self.program = program.Program(
             self.tokeniser, self.lister, hide_listing, hide_protected,
-            allow_code_poke, self.memory, bytecode, rebuild_offsets
+            allow_code_poke, self.memory, bytecode, rebuild_offsets, program_cache or None
         )
         # register all data segment users
         self.memory.set_buffers(self.program)
@@ -113,7 +122,9 @@ class Implementation(object):
         self.codepage = cp.Codepage(codepage, box_protect)
         # set up input event handler
         # no interface yet; use dummy queues
-        self.queues = eventcycle.EventQueues(ctrl_c_is_break, inputs=queue.Queue())
+        self.queues = eventcycle.EventQueues(
+            ctrl_c_is_break, inputs=queue.Queue(), poll_interval=event_poll_interval
+        )
         # prepare I/O streams
         self.io_streams = iostreams.IOStreams(
             self.queues, self.codepage, input_streams, output_streams,
@@ -196,7 +207,7 @@ class Implementation(object):
         # interpreter
         ######################################################################
         # initialise the parser
-        self.parser = parser.Parser(self.values, self.memory, syntax)
+        self.parser = parser.Parser(self.values, self.memory, syntax, fast_math)
         # initialise the interpreter
         self.interpreter = interpreter.Interpreter(
             self.queues, self.console, self.display.cursor, self.files, self.sound,
@@ -217,6 +228,11 @@ class Implementation(object):
         )
         # build function table (depends on Memory having been initialised)
         self.parser.init_callbacks(self)
+        # execution profiler
+        self.profiler = None
+        if profile:
+            self.profiler = profiler.Profiler(self.program, token_keyword)
+            self.profiler.attach(self.interpreter, self.parser)
 
     def __getstate__(self):
         """Pickle the session."""
@@ -227,6 +243,8 @@ class Implementation(object):
         self.__dict__.update(pickle_dict)
         # re-assign callbacks (not picklable)
         self.parser.init_callbacks(self)
+        if self.profiler:
+            self.profiler.attach(self.interpreter, self.parser)
         # reopen keyboard, in case we quit because it was closed
         self.keyboard._input_closed = False
         # suppress double prompt
@@ -246,6 +264,15 @@ class Implementation(object):
             # but an input queue should be operational for I/O streams
             self.queues.set(inputs=queue.Queue())
 
+    def redirect_streams(self, input_streams, output_streams):
+        """Replace the redirected input and output streams."""
+        self.io_streams.redirect(input_streams, output_streams)
+        # drop input left over from the previous streams
+        while not self.queues.inputs.empty():
+            self.queues.inputs.get(False)
+            self.queues.inputs.task_done()
+        self.keyboard.reopen_input()
+
     def execute(self, command):
         """Execute a BASIC statement."""
         with self._handle_exceptions():
@@ -309,6 +336,24 @@ class Implementation(object):
             convert = self.get_converter(type(value), as_type)
             return convert(value)
 
+    def view_array(self, name):
+        """Get an array's buffer as memoryview, with its shape and base; None if not allocated."""
+        return self.arrays.view_array(name.upper().split(b'(', 1)[0])
+
+    def get_array(self, name):
+        """Get the elements of an array as a flat list."""
+        return self.arrays.to_flat_list(name.upper().split(b'(', 1)[0])
+
+    def set_array(self, name, value, shape=None):
+        """Set the elements of an array from a flat list."""
+        name = name.upper().split(b'(', 1)[0]
+        if name[-1:] == values.STR:
+            value = [
+                self.codepage.unicode_to_bytes(_item) if isinstance(_item, text_type) else _item
+                for _item in value
+            ]
+        self.arrays.from_flat_list(value, name, shape)
+
     def interact(self):
         """Interactive interpreter session."""
         while True:
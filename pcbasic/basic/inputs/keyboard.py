@@ -304,6 +304,11 @@ class Keyboard(object):
         """Signal that input stream has closed."""
         self._input_closed = True
 
+    def reopen_input(self):
+        """Discard redirected input and wait for a new input stream."""
+        self._stream_buffer.clear()
+        self._input_closed = False
+
     # macros
 
     def set_macro(self, num, macro):
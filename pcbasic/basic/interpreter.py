@@ -15,6 +15,10 @@ from .base import codestream
 from . import values
 
 
+# single-precision values are exact integers when counting in integer steps below this magnitude
+SINGLE_EXACT = 1 << 24
+
+
 class Interpreter(object):
     """BASIC interpreter."""
 
@@ -40,6 +44,9 @@ class Interpreter(object):
         self.current_statement = 0
         # statement syntax parser
         self.parser = parser
+        # parsed DATA items, by position and string or number type
+        self._data_items = {}
+        self._data_items_revision = None
         # line number tracing
         self.tron = False
         # pointer position: False for direct line, True for program
@@ -84,7 +91,7 @@ class Interpreter(object):
             # update what basic events need to be handled
             self._queues.set_basic_event_handlers(self._basic_events.enabled)
             # check input and BASIC events. may raise Break, Reset or Exit
-            self._queues.check_events()
+            self._queues.poll()
             try:
                 self.handle_basic_events()
                 ins = self.get_codestream()
@@ -400,16 +407,53 @@ class Interpreter(object):
         # initialise loop variable
         self._scalars.set(varname, start)
         # obtain a view of the loop variable
-        self.for_stack.append((varname, stop, step, step.sign(), forpos, nextpos,))
+        self.for_stack.append((
+            varname, stop, step, step.sign(), forpos, nextpos,
+            self._get_integral_loop(varname, stop, step)
+        ))
         # empty loop: jump to NEXT without executing block
         if (start.gt(stop) if step.sign() >= 0 else stop.gt(start)):
             ins.seek(nextpos)
             self.iterate_loop()
 
+    def _get_integral_loop(self, varname, stop, step):
+        """Loop state for counting with Python ints, or None if the loop needs MBF arithmetic."""
+        buffer = self._scalars.get_buffer(varname)
+        if varname[-1:] == values.INT:
+            return [buffer, None, None, None, stop.to_int(), step.to_int()]
+        # single-precision counters can count on ints while all values are exact integers
+        counter = self._values.create(buffer)
+        bounds = [counter.to_value(), stop.to_value(), step.to_value()]
+        if any(_x != int(_x) or abs(_x) >= SINGLE_EXACT for _x in bounds):
+            return None
+        return [buffer, counter, bytes(buffer)] + [int(_x) for _x in bounds]
+
+    def _iterate_integral_loop(self, varname, sgn, loop):
+        """Increment an integral loop counter; return whether the loop ends, or None if not integral."""
+        buffer, counter_view, last, counter, stop, step = loop
+        if buffer is not self._scalars.get_buffer(varname):
+            loop[0] = None
+            return None
+        if counter_view is None:
+            # integer counter: follow any changes made in the loop body
+            counter = struct.unpack_from('<h', buffer)[0] + step
+            if not -0x8000 <= counter <= 0x7fff:
+                raise error.BASICError(error.OVERFLOW)
+            struct.pack_into('<h', buffer, 0, counter)
+        else:
+            counter += step
+            # don't keep counting if the loop body changed the counter or we'd lose precision
+            if buffer != last or abs(counter) >= SINGLE_EXACT:
+                loop[0] = None
+                return None
+            counter_view.from_int(counter)
+            loop[2:4] = bytes(buffer), counter
+        return counter > stop if sgn > 0 else stop > counter
+
     def _find_next(self, ins, varname):
         """Helper function for FOR: find matching NEXT."""
         endforpos = ins.tell()
-        ins.skip_block(tk.FOR, tk.NEXT, allow_comma=True)
+        self._skip_block(ins, tk.FOR, tk.NEXT, allow_comma=True)
         if ins.skip_blank() not in (tk.NEXT, b','):
             # FOR without NEXT marked with FOR line number
             ins.seek(endforpos)
@@ -444,7 +488,7 @@ class Interpreter(object):
         # find the matching NEXT record
         num = len(self.for_stack)
         for depth in range(num):
-            varname2, stop, step, sgn, forpos, nextpos = self.for_stack[-depth-1]
+            varname2, stop, step, sgn, forpos, nextpos, loop = self.for_stack[-depth-1]
             if pos == nextpos:
                 if varname is not None and varname2 != self._memory.complete_name(varname):
                     # check once more for matches
@@ -455,11 +499,14 @@ class Interpreter(object):
                 break
         else:
             raise error.BASICError(error.NEXT_WITHOUT_FOR)
-        # increment counter
-        counter_view = self._scalars.view(varname2)
-        counter_view.iadd(step)
-        # check condition
-        loop_ends = counter_view.gt(stop) if sgn > 0 else stop.gt(counter_view)
+        # increment counter and check condition
+        loop_ends = None
+        if loop is not None and loop[0] is not None:
+            loop_ends = self._iterate_integral_loop(varname2, sgn, loop)
+        if loop_ends is None:
+            counter_view = self._scalars.view(varname2)
+            counter_view.iadd(step)
+            loop_ends = counter_view.gt(stop) if sgn > 0 else stop.gt(counter_view)
         if loop_ends:
             self.for_stack.pop()
         else:
@@ -479,7 +526,7 @@ class Interpreter(object):
         """Helper function for WHILE: find matching WEND."""
         # just after WHILE token
         whilepos = ins.tell()
-        ins.skip_block(tk.WHILE, tk.WEND)
+        self._skip_block(ins, tk.WHILE, tk.WEND)
         if ins.read(1) != tk.WEND:
             # WHILE without WEND
             ins.seek(whilepos)
@@ -489,6 +536,14 @@ class Interpreter(object):
         ins.seek(whilepos)
         return whilepos, wendpos
 
+    def _skip_block(self, ins, for_char, next_char, allow_comma=False):
+        """Skip to the end of a loop block."""
+        if ins is self._program_code:
+            # use the program's block index
+            self._program.skip_block(for_char, next_char, allow_comma)
+        else:
+            ins.skip_block(for_char, next_char, allow_comma)
+
     def _check_while_condition(self, ins, whilepos):
         """Check condition of while-loop."""
         ins.seek(whilepos)
@@ -535,53 +590,72 @@ class Interpreter(object):
 
     def read_(self, args):
         """READ: read values from DATA statement."""
-        data_error = False
         for name, indices in args:
             name = self._memory.complete_name(name)
             current = self._program_code.tell()
             self._program_code.seek(self.data_pos)
             if self._program_code.peek() in tk.END_STATEMENT:
                 # initialise - find first DATA
-                self._program_code.skip_to_token(tk.DATA,)
+                self._program.skip_to_data()
             if self._program_code.read(1) not in (tk.DATA, b','):
                 self._program_code.seek(current)
                 raise error.BASICError(error.OUT_OF_DATA)
-            self._program_code.skip_blank()
-            if name[-1:] == values.STR:
-                # for unquoted strings, payload starts at the first non-empty character
-                address = self._program_code.tell_address()
-                word = self._program_code.read_to((b',', b'"',) + tk.END_STATEMENT)
-                if self._program_code.peek() == b'"':
-                    if word == b'':
-                        # nothing before the quotes, so this is a quoted string literal
-                        # string payload starts after quote
-                        address = self._program_code.tell_address() + 1
-                        word = self._program_code.read_string().strip(b'"')
-                    else:
-                        # complete unquoted string literal
-                        word += self._program_code.read_string()
-                    if (self._program_code.skip_blank() not in (tk.END_STATEMENT + (b',',))):
-                        raise error.BASICError(error.STX)
-                else:
-                    word = word.strip(self._program_code.blanks)
+            is_string = name[-1:] == values.STR
+            word, address, data_pos, data_error = self._read_data_item(is_string)
+            if is_string:
                 value = self._values.from_str_at(word, address)
             else:
-                word = self._program_code.read_number()
                 value = self._values.from_repr(word, allow_nonnum=False)
-                # anything after the number is a syntax error, but assignment has taken place)
-                if (self._program_code.skip_blank() not in (tk.END_STATEMENT + (b',',))):
-                    data_error = True
             # restore to current program location
             # to ensure any other errors in set_variable get the correct line number
-            data_pos = self._program_code.tell()
             self._program_code.seek(current)
             self._memory.set_variable(name, indices, value=value)
             if data_error:
+                # anything after the number is a syntax error, but assignment has taken place
                 self._program_code.seek(self.data_pos)
                 raise error.BASICError(error.STX)
             else:
                 self.data_pos = data_pos
 
+    def _read_data_item(self, is_string):
+        """Read a DATA item; return payload, address, end position and syntax error flag."""
+        if self._data_items_revision != self._program.revision:
+            self._data_items = {}
+            self._data_items_revision = self._program.revision
+        key = self._program_code.tell(), is_string
+        try:
+            return self._data_items[key]
+        except KeyError:
+            pass
+        data_error = False
+        self._program_code.skip_blank()
+        address = None
+        if is_string:
+            # for unquoted strings, payload starts at the first non-empty character
+            address = self._program_code.tell_address()
+            word = self._program_code.read_to((b',', b'"',) + tk.END_STATEMENT)
+            if self._program_code.peek() == b'"':
+                if word == b'':
+                    # nothing before the quotes, so this is a quoted string literal
+                    # string payload starts after quote
+                    address = self._program_code.tell_address() + 1
+                    word = self._program_code.read_string().strip(b'"')
+                else:
+                    # complete unquoted string literal
+                    word += self._program_code.read_string()
+                if (self._program_code.skip_blank() not in (tk.END_STATEMENT + (b',',))):
+                    raise error.BASICError(error.STX)
+            else:
+                word = word.strip(self._program_code.blanks)
+        else:
+            word = self._program_code.read_number()
+            # anything after the number is a syntax error, but assignment has taken place
+            if (self._program_code.skip_blank() not in (tk.END_STATEMENT + (b',',))):
+                data_error = True
+        item = word, address, self._program_code.tell(), data_error
+        self._data_items[key] = item
+        return item
+
     ###########################################################################
     # COMMON
 
@@ -30,6 +30,18 @@ class IOStreams(object):
         """Initialise I/O streams."""
         self._queues = queues
         self._codepage = codepage
+        # disable at start
+        self._active = False
+        self._thread = None
+        self.redirect(input_streams, output_streams)
+
+    def redirect(self, input_streams, output_streams):
+        """Replace the input and output streams."""
+        # stop reading from the previous input streams
+        if self._thread:
+            self.close()
+            self._thread.join()
+            self._thread = None
         # input
         if input_streams in (u'stdio', b'stdio'):
             # sentinel value
@@ -70,15 +82,19 @@ class IOStreams(object):
             self._codepage.wrap_output_stream(stream, preserve=CONTROL)
             for stream in output_streams
         ]
-        # disable at start
-        self._active = False
         # launch a daemon thread for input
         self._stop_threads = False
         if self._input_streams:
             # launch a thread to allow nonblocking reads on both Windows and Unix
-            thread = threading.Thread(target=self._process_input, args=())
-            thread.daemon = True
-            thread.start()
+            self._thread = threading.Thread(target=self._process_input, args=())
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __getstate__(self):
+        """Pickle; threads can't be pickled."""
+        pickle_dict = self.__dict__.copy()
+        pickle_dict['_thread'] = None
+        return pickle_dict
 
     def close(self):
         """Kill threads before exit."""
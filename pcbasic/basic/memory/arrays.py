@@ -8,6 +8,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import binascii
 import struct
+from bisect import bisect_right
 
 from ...compat import iteritems, iterkeys
 
@@ -45,10 +46,16 @@ class Arrays(object):
         self._dims = {}
         self._buffers = {}
         self._array_memory = {}
+        # offsets of string array elements that have been assigned a non-empty string
+        self._string_elements = {}
+        # record offsets in ascending order and the names they belong to
+        self._addresses = []
+        self._names = []
         self.current = 0
 
     def erase_(self, args):
         """Remove an array from memory."""
+        self._memory.invalidate_slots()
         for name in args:
             name = self._memory.complete_name(name)
             if name not in self._dims:
@@ -62,12 +69,17 @@ class Arrays(object):
             del self._dims[name]
             del self._buffers[name]
             del self._array_memory[name]
+            self._string_elements.pop(name, None)
             # update memory model
             for name in self._array_memory:
                 name_ptr, array_ptr = self._array_memory[name]
                 if name_ptr > erased_name_ptr:
                     self._array_memory[name] = name_ptr - freed_bytes, array_ptr - freed_bytes
             self.current -= freed_bytes
+            # arrays above the erased one move down
+            index = bisect_right(self._addresses, erased_name_ptr) - 1
+            del self._names[index]
+            self._addresses[index:] = [_addr - freed_bytes for _addr in self._addresses[index+1:]]
         # if all arrays have been cleared and array base was set to 0 implicitly by DIM, unset it
         # however, if array base was set explicitly by OPTION BASE, it remains set.
         if not self._dims and self._base_set_by_dim:
@@ -87,6 +99,13 @@ class Arrays(object):
         """Return a memoryview to a full array."""
         return memoryview(self._buffers[name])
 
+    def set_full_buffer(self, name, buf):
+        """Replace the contents of a full array."""
+        lst = self._buffers[name]
+        lst[:] = buf
+        if name in self._string_elements:
+            self._string_elements[name] = set(_i for _i in range(0, len(lst), 3) if lst[_i])
+
     def dimensions(self, name):
         """Return the dimensions of an array."""
         return self._dims[name]
@@ -143,8 +162,13 @@ class Arrays(object):
         self._memory.check_free(total_bytes, error.OUT_OF_MEMORY)
         self.current += total_bytes
         self._array_memory[name] = (name_ptr, array_ptr)
+        # new arrays go at the end
+        self._addresses.append(name_ptr)
+        self._names.append(name)
         self._buffers[name] = bytearray(array_bytes)
         self._dims[name] = dimensions
+        if name[-1:] == values.STR:
+            self._string_elements[name] = set()
 
     def check_dim(self, name, index):
         """
@@ -185,12 +209,15 @@ class Arrays(object):
             raise error.BASICError(error.DUPLICATE_DEFINITION)
         self._base = base
 
-    def view_buffer(self, name, index):
-        """Return a memoryview to an array element."""
+    def view_buffer(self, name, index, assign=False):
+        """Return a memoryview to an array element; with assign, the caller may write to it."""
         dimensions, lst = self.check_dim(name, index)
-        bigindex = self.index(index, dimensions)
         bytesize = values.size_bytes(name)
-        return memoryview(lst)[bigindex*bytesize:(bigindex+1)*bytesize]
+        offset = self.index(index, dimensions) * bytesize
+        if assign and name in self._string_elements:
+            # an emptied element is dropped at the next garbage collection
+            self._string_elements[name].add(offset)
+        return memoryview(lst)[offset:offset+bytesize]
 
     def get(self, name, index):
         """Retrieve a view of the value of an array element."""
@@ -203,7 +230,16 @@ class Arrays(object):
         if isinstance(value, values.String):
             self._memory.strings.fix_temporaries()
         # copy value into array
-        self.view_buffer(name, index)[:] = values.to_type(name[-1:], value).to_bytes()
+        dimensions, lst = self.check_dim(name, index)
+        bytesize = values.size_bytes(name)
+        offset = self.index(index, dimensions) * bytesize
+        lst[offset:offset+bytesize] = values.to_type(name[-1:], value).to_bytes()
+        if name in self._string_elements:
+            # track elements holding a non-empty string
+            if lst[offset]:
+                self._string_elements[name].add(offset)
+            else:
+                self._string_elements[name].discard(offset)
         # drop cache here
 
     def varptr(self, name, indices):
@@ -216,34 +252,32 @@ class Arrays(object):
             values.size_bytes(name) * self.index(indices, dimensions)
         )
 
+    def _find(self, offset):
+        """Find the array whose record contains the offset into array space; None if none."""
+        index = bisect_right(self._addresses, offset)
+        if not index:
+            return None
+        return self._names[index-1]
+
     def dereference(self, address):
         """Get a value for an array given its pointer address."""
-        found_addr = -1
-        found_name = None
-        for name, data in iteritems(self._array_memory):
-            addr = self._memory.var_current() + data[1]
-            if addr > found_addr and addr <= address:
-                found_addr = addr
-                found_name = name
-        if not found_name:
+        name = self._find(address - self._memory.var_current())
+        if name is None:
             return None
+        _, array_ptr = self._array_memory[name]
         lst = self._buffers[name]
-        offset = address - found_addr
+        offset = address - self._memory.var_current() - array_ptr
+        if offset < 0 or offset >= len(lst):
+            return None
         return self._values.from_bytes(lst[offset : offset+values.size_bytes(name)])
 
     def get_memory(self, address):
         """Retrieve data from data memory: array space """
-        name_addr = -1
-        arr_addr = -1
-        for name in self._array_memory:
-            name_try, arr_try = self._array_memory[name]
-            if name_try <= address and name_try > name_addr:
-                name_addr, arr_addr = name_try, arr_try
-                the_arr = name
-                break
-        else: # pragma: no cover
-            return -1
         var_current = self._memory.var_current()
+        the_arr = self._find(address - var_current)
+        if the_arr is None: # pragma: no cover
+            return -1
+        name_addr, arr_addr = self._array_memory[the_arr]
         dimensions = self._dims[the_arr]
         if address >= var_current + arr_addr:
             offset = address - arr_addr - var_current
@@ -267,18 +301,77 @@ class Arrays(object):
                 return ord(data_rep[offset:offset+1])
 
     def get_strings(self):
-        """Return a list of views of string array elements."""
-        return [
-            memoryview(buf)[i:i+3]
-            for name, buf in iteritems(self._buffers)
-            if name[-1:] == values.STR
-            for i in range(0, len(buf), 3)
-        ]
+        """Return a list of views of string array elements that hold a non-empty string."""
+        string_ptrs = []
+        for name, elements in iteritems(self._string_elements):
+            buf = self._buffers[name]
+            # drop elements emptied through a view, e.g. by SWAP
+            elements.difference_update([_i for _i in elements if not buf[_i]])
+            view = memoryview(buf)
+            string_ptrs.extend(view[_i:_i+3] for _i in elements)
+        return string_ptrs
 
 
     ###########################################################################
     # helper functions for Python interface
 
+    def _shape(self, name):
+        """Number of elements along each dimension."""
+        return tuple(_dim + 1 - (self._base or 0) for _dim in self._dims[name])
+
+    def view_array(self, name):
+        """Return a memoryview to a full array with its shape and base; None if not allocated."""
+        if name not in self._dims:
+            return None
+        # string pointers written through the view are not seen by garbage collection
+        return self.view_full_buffer(name), self._shape(name), self._base or 0
+
+    def to_flat_list(self, name):
+        """Convert BASIC array to flat Python list, first index varying fastest."""
+        if name not in self._dims:
+            return []
+        buf = self._buffers[name]
+        if name[-1:] != values.STR:
+            return values.mbf.decode(name[-1:], buf)
+        pointers = struct.unpack('<' + 'BH' * (len(buf) // 3), buf)
+        view = self._memory.strings.view
+        return [view(*pointers[_i:_i+2]).tobytes() for _i in range(0, len(pointers), 2)]
+
+    def from_flat_list(self, python_list, name, shape=None):
+        """Convert flat Python list to BASIC array, first index varying fastest."""
+        if not len(python_list):
+            raise ValueError('Array must not be empty.')
+        if name in self._dims:
+            shape = self._shape(name)
+        elif shape is None:
+            shape = (len(python_list),)
+        count = 1
+        for length in shape:
+            count *= length
+        if len(python_list) != count:
+            raise ValueError('Array %s has %d elements, not %d.' % (name, count, len(python_list)))
+        if name[-1:] != values.STR:
+            # convert all values before changing or allocating anything
+            data = values.mbf.encode(name[-1:], python_list, self._values)
+        elif not all(isinstance(_item, (bytes, bytearray)) for _item in python_list):
+            raise TypeError('String array values must be bytes.')
+        if name not in self._dims:
+            self.allocate(name, [_length - 1 + (self._base or 0) for _length in shape])
+        buf = self._buffers[name]
+        if name[-1:] != values.STR:
+            buf[:] = data
+            return
+        strings, elements = self._memory.strings, self._string_elements[name]
+        for offset, python_str in zip(range(0, len(buf), 3), python_list):
+            # attach each string before storing the next, which may collect garbage
+            pointer = strings.store(python_str)
+            strings.fix_temporaries()
+            buf[offset:offset+3] = struct.pack('<BH', *pointer)
+            if python_str:
+                elements.add(offset)
+            else:
+                elements.discard(offset)
+
     def from_list(self, python_list, name):
         """Convert Python list to BASIC array."""
         self._from_list(python_list, name, [])
@@ -6,6 +6,7 @@ Model memory
 This file is released under the GNU GPL version 3 or later.
 """
 
+import time
 import struct
 from contextlib import contextmanager
 from collections import deque
@@ -111,6 +112,8 @@ class DataSegment(object):
         self.code_start = self._field_mem_base + (max_files+1) * self._field_mem_offset
         # default sigils for names
         self.deftype = [values.SNG]*26
+        # bumped whenever resolved scalar slots may have become stale
+        self._generation = 0
         # string space
         self.strings = values.StringSpace(self)
         # prepare string and number handler
@@ -134,6 +137,10 @@ class DataSegment(object):
         }
         # garbage collection switch
         self._allow_collect = True
+        # garbage collection counters
+        self._collections = 0
+        self._bytes_moved = 0
+        self._collect_time = 0.
 
     def set_buffers(self, program):
         """Register program and variables."""
@@ -154,6 +161,7 @@ class DataSegment(object):
     def clear_deftype(self):
         """Reset default sigils."""
         self.deftype = [values.SNG]*26
+        self.invalidate_slots()
 
     def deftype_(self, sigil, args):
         """DEFSTR/DEFINT/DEFSNG/DEFDBL: set type defaults for variables."""
@@ -164,6 +172,7 @@ class DataSegment(object):
             else:
                 stop = start
             self.deftype[start:stop+1] = [sigil] * (stop-start+1)
+        self.invalidate_slots()
 
     def defint_(self, args):
         """Set default integer variables."""
@@ -187,6 +196,7 @@ class DataSegment(object):
             # deftype is not preserved on CHAIN with ALL, but is preserved with MERGE
             self.clear_deftype()
         # clear arrays, scalars and string space
+        self.invalidate_slots()
         self.scalars.clear()
         self.arrays.clear()
         self.strings.clear()
@@ -252,13 +262,14 @@ class DataSegment(object):
             if self.var_start() + scalar_size + array_size > string_store.current:
                 raise error.BASICError(error.OUT_OF_MEMORY)
             self.strings.rebuild(string_store)
+            self.invalidate_slots()
             for name, value in iteritems(common_scalars):
                 self.scalars.set(name, value)
             for name, value in iteritems(common_arrays):
                 dimensions, buf = value
                 self.arrays.allocate(name, dimensions)
                 # copy the array buffers back
-                self.arrays.view_full_buffer(name)[:] = buf
+                self.arrays.set_full_buffer(name, buf)
 
     def _get_free(self):
         """Return the amount of memory available to variables, arrays, strings and code."""
@@ -275,10 +286,21 @@ class DataSegment(object):
         """Collect garbage from string space. Compactify string storage."""
         if not self._allow_collect:
             return
+        start = time.time()
         # find all strings that are actually referenced
         stack_strings = [value.view() for stack in self._stack for value in stack if isinstance(value, values.String)]
         string_ptrs = self.scalars.get_strings() + self.arrays.get_strings() + stack_strings
-        self.strings.collect_garbage(string_ptrs)
+        self._bytes_moved += self.strings.collect_garbage(string_ptrs)
+        self._collections += 1
+        self._collect_time += time.time() - start
+
+    def get_garbage_stats(self):
+        """Number of garbage collections, bytes of string data moved and time spent collecting."""
+        return {
+            u'collections': self._collections,
+            u'bytes_moved': self._bytes_moved,
+            u'time': self._collect_time,
+        }
 
     def check_free(self, size, err):
         """Check if sufficient free memory is avilable, raise error if not."""
@@ -448,6 +470,33 @@ class DataSegment(object):
             # array is allocated if retrieved and nonexistant
             return self.arrays.get(name, indices)
 
+    def invalidate_slots(self):
+        """Mark all resolved scalar slots as stale."""
+        self._generation += 1
+
+    def scalar_slot(self, name):
+        """Create a slot for a scalar variable name as it appears in code."""
+        return self.resolve_slot(scalars.ScalarSlot(name))
+
+    def resolve_slot(self, slot):
+        """Bring a scalar slot up to date with the variable space."""
+        if slot.generation != self._generation:
+            slot.name = self.complete_name(slot.code_name)
+            slot.buffer = None
+            slot.generation = self._generation
+        if slot.buffer is None:
+            slot.buffer = self.scalars.get_buffer(slot.name)
+        return slot
+
+    def view_slot(self, slot):
+        """Retrieve the value of a scalar variable through its slot."""
+        if slot.generation != self._generation or slot.buffer is None:
+            self.resolve_slot(slot)
+            if slot.buffer is None:
+                return self.values.new(slot.name[-1:])
+        # this is a view, as for scalars.get
+        return self.values.create(slot.buffer)
+
     def _preallocate(self, name, indices):
         """Pre-allocate space for variable."""
         if indices != []:
@@ -460,16 +509,37 @@ class DataSegment(object):
 
     def let_(self, args):
         """LET: assign value to variable or array."""
-        name, indices = next(args)
+        target = next(args)
+        if isinstance(target, scalars.ScalarSlot):
+            self._let_slot(target, args)
+            return
+        name, indices = target
         name = self.complete_name(name)
         self._preallocate(name, indices)
-        value = next(args)
+        value = self._let_value(next(args))
+        self.set_variable(name, indices, value)
+
+    def _let_slot(self, slot, args):
+        """LET: assign value to a scalar variable through its slot."""
+        self.resolve_slot(slot)
+        if slot.buffer is None:
+            # allocate memory for the new variable prior to calculating the new value
+            self.set_variable(slot.name, [], None)
+            self.resolve_slot(slot)
+        value = self._let_value(next(args))
+        # the variable exists, so no allocation or garbage collection will take place
+        if isinstance(value, values.String):
+            self.strings.fix_temporaries()
+        slot.buffer[:] = values.to_type(slot.name[-1:], value).to_bytes()[:]
+
+    def _let_value(self, value):
+        """Prepare a value for assignment."""
         if isinstance(value, values.String):
             # if already permanent, store a deep copy to avoid double referencing
             # if RHS is a field string, deep copy as LHS should not point to the field
             if self.strings.is_permanent(value) or self.strings.is_field_string(value):
                 value = value.new().from_str(value.dereference())
-        self.set_variable(name, indices, value)
+        return value
 
     def set_variable(self, name, indices, value):
         """
@@ -563,7 +633,7 @@ class DataSegment(object):
             return self.scalars.view_buffer(name)
         else:
             # array will be allocated if retrieved and nonexistant
-            return self.arrays.view_buffer(name, indices)
+            return self.arrays.view_buffer(name, indices, assign=True)
 
     def swap_(self, args):
         """Swap two variables."""
@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import struct
+from bisect import bisect_right
 
 from ...compat import iteritems, iterkeys
 
@@ -41,6 +42,11 @@ class Scalars(object):
         """Clear scalar variables."""
         self._vars = {}
         self._var_memory = {}
+        # record addresses in ascending order and the names they belong to
+        self._addresses = []
+        self._names = []
+        # names by value address
+        self._pointers = {}
         self.current = 0
 
     @staticmethod
@@ -78,6 +84,11 @@ class Scalars(object):
             var_ptr = name_ptr + self._record_size(name)
             self.current += size
             self._var_memory[name] = (name_ptr, var_ptr)
+            # variables are allocated at increasing addresses, so this normally appends
+            index = bisect_right(self._addresses, name_ptr)
+            self._addresses.insert(index, name_ptr)
+            self._names.insert(index, name)
+            self._pointers[var_ptr] = name
         # don't change the value if just checking allocation
         if value is None:
             if name in self._vars:
@@ -108,6 +119,10 @@ class Scalars(object):
         """Retrieve a view of an existing scalar variable's buffer."""
         return memoryview(self._vars[name])
 
+    def get_buffer(self, name):
+        """Retrieve the storage buffer of a scalar variable; None if not allocated."""
+        return self._vars.get(name)
+
     def varptr(self, name):
         """Retrieve the address of a scalar variable."""
         _, var_ptr = self._var_memory[name]
@@ -115,23 +130,19 @@ class Scalars(object):
 
     def dereference(self, address):
         """Get a value for a scalar given its pointer address."""
-        for name, data in iteritems(self._var_memory):
-            if data[1] == address:
-                return self.get(name)
-        return None
+        name = self._pointers.get(address)
+        if name is None:
+            return None
+        return self.get(name)
 
     def get_memory(self, address):
         """Retrieve data from data memory: variable space """
-        name_addr = -1
-        var_addr = -1
-        the_var = None
-        for name in self._var_memory:
-            name_try, var_try = self._var_memory[name]
-            if name_try <= address and name_try > name_addr:
-                name_addr, var_addr = name_try, var_try
-                the_var = name
-        if the_var is None: # pragma: no cover
+        # find the last record that starts at or before the address
+        index = bisect_right(self._addresses, address)
+        if not index: # pragma: no cover
             return -1
+        the_var = self._names[index-1]
+        name_addr, var_addr = self._var_memory[the_var]
         if address >= var_addr:
             offset = address - var_addr
             if offset >= values.size_bytes(the_var): # pragma: no cover
@@ -149,6 +160,22 @@ class Scalars(object):
         ]
 
 
+class ScalarSlot(object):
+    """Reference to a scalar variable as named in program code."""
+
+    __slots__ = ('code_name', 'name', 'buffer', 'generation')
+
+    def __init__(self, code_name):
+        """Create an unresolved slot for a name as it appears in the code."""
+        self.code_name = code_name
+        # fully qualified name, including sigil
+        self.name = None
+        # variable storage; None if not allocated
+        self.buffer = None
+        # variable space generation at which name was resolved
+        self.generation = None
+
+
 ###############################################################################
 # variable memory
 
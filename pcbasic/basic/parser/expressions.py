@@ -21,12 +21,23 @@ from . import operators as op
 from . import userfunctions
 
 
+# steps in a compiled expression
+_APPLY, _SCALAR, _UNIT, _CONSTANT = range(4)
+
+# precision ranks for fast math: integer, single, double
+_PRECISION = {values.INT: 0, values.SNG: 1, values.DBL: 2}
+# fast math results at or beyond this magnitude overflow in MBF
+_NATIVE_LIMIT = 2.**127
+
+
 class ExpressionParser(object):
     """Expression parser."""
 
-    def __init__(self, values, memory):
+    def __init__(self, values, memory, fast_math=False):
         """Initialise empty expression."""
         self._values = values
+        # evaluate arithmetic expressions with Python floats
+        self._fast_math = fast_math
         # for variable retrieval
         self._memory = memory
         # user-defined functions
@@ -36,6 +47,12 @@ class ExpressionParser(object):
         # callbacks must be initilised later
         self._callbacks = {}
         self._extensions = {}
+        # compiled expressions in program code, by offset
+        self._compiled = {}
+        self._compiled_revision = None
+        # decoded number literals in program code, by offset
+        self._literals = {}
+        self._literals_revision = None
 
     def _init_syntax(self):
         """Initialise function syntax tables."""
@@ -223,6 +240,10 @@ class ExpressionParser(object):
         pickle_dict['_simple'] = None
         pickle_dict['_complex'] = None
         pickle_dict['_callbacks'] = None
+        pickle_dict['_compiled'] = {}
+        pickle_dict['_compiled_revision'] = None
+        pickle_dict['_literals'] = {}
+        pickle_dict['_literals_revision'] = None
         return pickle_dict
 
     def __setstate__(self, pickle_dict):
@@ -237,90 +258,264 @@ class ExpressionParser(object):
 
     def parse(self, ins):
         """Parse and evaluate tokenised (sub-)expression."""
-        operations = deque()
         with self._memory.get_stack() as units:
-            final = True
-            # see https://en.wikipedia.org/wiki/Shunting-yard_algorithm
-            d = b''
-            while True:
-                last = d
-                ins.skip_blank()
-                d = ins.read_keyword_token()
-                ins.seek(-len(d), 1)
-                if d == tk.NOT and not (last in op.OPERATORS or last == b''):
-                    # unary NOT ends expression except after another operator or at start
-                    break
-                elif d in op.OPERATORS:
-                    ins.read(len(d))
-                    # get combined operators such as >=
-                    if d in op.COMBINABLE:
-                        nxt = ins.skip_blank()
-                        if nxt in op.COMBINABLE:
-                            d += ins.read(len(nxt))
-                    if last in op.OPERATORS or last == b'' or d == tk.NOT:
-                        # also if last is ( but that leads to recursive call and last == ''
-                        nargs = 1
-                        # zero operands for a binary operator is always syntax error
-                        # because it will be seen as an illegal unary
-                        try:
-                            oper = op.UNARY[d]
-                            prec = op.PRECEDENCE[(d, nargs)]
-                        except KeyError:
-                            raise error.BASICError(error.STX)
+            program = self._memory.program
+            if ins is not program.bytecode:
+                return self._parse(ins, units, deque(), b'', None)
+            if self._compiled_revision != program.revision:
+                self._compiled.clear()
+                self._compiled_revision = program.revision
+            start = ins.tell()
+            try:
+                steps, end, native = self._compiled[start]
+            except KeyError:
+                # evaluate while recording the steps taken; keep them only if we get through
+                revision = program.revision
+                steps = []
+                value = self._parse(ins, units, deque(), b'', steps)
+                if program.revision == revision:
+                    native = self._compile_native(steps) if self._fast_math else None
+                    self._compiled[start] = steps, ins.tell(), native
+                return value
+            # a lone variable or constant is evaluated as before, so that we get a view
+            if native and native[-1][0] == _APPLY and native[-1][1]:
+                value = self._evaluate_native(native)
+                if value is not None:
+                    ins.seek(end)
+                    return value
+            return self._evaluate_compiled(ins, units, steps, end)
+
+    def _compile_native(self, steps):
+        """Translate compiled steps to Python float operations, if they are all arithmetic."""
+        native = []
+        for step in steps:
+            kind = step[0]
+            if kind == _APPLY:
+                _, oper, narity = step
+                table = op.NATIVE_UNARY if narity == 1 else op.NATIVE_BINARY
+                if oper not in table:
+                    return None
+                native.append((_APPLY, table[oper], narity, oper is values.pow))
+            elif kind == _SCALAR:
+                native.append(step)
+            else:
+                _, parse_unit, unit_start, _, _, _ = step
+                if parse_unit == self.read_number_literal and unit_start in self._literals:
+                    value, _ = self._literals[unit_start]
+                    native.append((_CONSTANT, (value.to_value(), _PRECISION[value.sigil])))
+                elif parse_unit == self._parse_bracket and unit_start + 1 in self._compiled:
+                    # inline the bracketed sub-expression
+                    inner = self._compiled[unit_start + 1][2]
+                    if inner is None:
+                        return None
+                    native.extend(inner)
+                else:
+                    return None
+        return native
+
+    def _evaluate_native(self, native):
+        """Evaluate in Python floats; None if the result may differ from MBF beyond rounding."""
+        stack = []
+        try:
+            for step in native:
+                kind = step[0]
+                if kind == _CONSTANT:
+                    stack.append(step[1])
+                elif kind == _SCALAR:
+                    value = self._memory.view_slot(step[1])
+                    if value.sigil not in _PRECISION:
+                        return None
+                    stack.append((value.to_value(), _PRECISION[value.sigil]))
+                else:
+                    _, func, narity, is_pow = step
+                    if narity == 1:
+                        if func is None:
+                            continue
+                        operand, precision = stack.pop()
+                        result = func(operand)
+                        precision = max(precision, 1)
                     else:
-                        nargs = 2
-                        try:
-                            oper = op.BINARY[d]
-                            prec = op.PRECEDENCE[(d, nargs)]
-                        except KeyError:
-                            # illegal combined ops like == raise syntax error here
-                            raise error.BASICError(error.STX)
-                        self._drain(prec, operations, units)
-                    operations.append((oper, nargs, prec))
-                elif not (last in op.OPERATORS or last == b''):
-                    # repeated unit ends expression
-                    # repeated literals or variables or non-keywords like 'AS'
-                    break
-                elif d == b'(':
-                    ins.read(len(d))
-                    # we need to create a new object or we'll overwrite our own stacks
-                    # this will not be needed if we localise stacks in the expression parser
-                    # either a separate class of just as local variables
-                    units.append(self.parse(ins))
-                    ins.require_read((b')',))
-                elif d and d in LETTERS:
-                    name = ins.read_name()
-                    error.throw_if(not name, error.STX)
-                    indices = self.parse_indices(ins)
-                    view = self._memory.view_or_create_variable(name, indices)
-                    # should make a shallow copy? but .clone here breaks circular MID$
-                    units.append(view)
-                elif d in self._functions:
-                    units.append(self._parse_function(ins, d))
-                    #if not isinstance(units[-1], values.String):
-                    #    self._memory.strings.reset_temporaries()
-                elif d in tk.END_STATEMENT:
-                    break
-                elif d in tk.END_EXPRESSION:
-                    # missing operand inside brackets or before comma is syntax error
-                    final = False
-                    break
-                elif d == b'"':
-                    units.append(self.read_string_literal(ins))
+                        right, right_precision = stack.pop()
+                        left, precision = stack.pop()
+                        result = func(left, right)
+                        precision = max(precision, right_precision, 1)
+                        if is_pow and not self._values.double_math:
+                            precision = 1
+                    # also excludes NaN and, in Python 3, complex results
+                    if not -_NATIVE_LIMIT < result < _NATIVE_LIMIT:
+                        return None
+                    stack.append((result, precision))
+        except (ArithmeticError, TypeError, ValueError):
+            # division by zero, overflow: leave the error handling to MBF evaluation
+            return None
+        result, precision = stack[0]
+        if precision == 0:
+            return self._values.new_integer().from_int(result)
+        elif precision == 1:
+            return self._values.new_single().from_value(result)
+        return self._values.new_double().from_value(result)
+
+    def _evaluate_compiled(self, ins, units, steps, end):
+        """Evaluate a compiled expression."""
+        # for each unit, whether it is an intermediate result referenced only from this stack
+        # once consumed by the next operator, these can be recycled
+        owned = []
+        release = self._values.release
+        for step in steps:
+            kind = step[0]
+            if kind == _APPLY:
+                _, oper, narity = step
+                if narity == 1:
+                    operand = units.pop()
+                    result = oper(operand)
+                    if result is operand:
+                        units.append(result)
+                        continue
+                    if owned.pop():
+                        release(operand)
+                    result_owned = True
                 else:
-                    units.append(self.read_number_literal(ins))
-            # raises IndexError for insufficient operators
-            try:
-                self._drain(0, operations, units)
-                return units[0]
-            except IndexError:
-                # empty expression is a syntax error (inside brackets)
-                # or Missing Operand (in an assignment)
-                if final:
-                    raise error.BASICError(error.MISSING_OPERAND)
-                raise error.BASICError(error.STX)
+                    right = units.pop()
+                    left = units.pop()
+                    result = oper(left, right)
+                    right_owned = owned.pop()
+                    left_owned = owned.pop()
+                    if right_owned and result is not right:
+                        release(right)
+                    if left_owned and result is not left:
+                        release(left)
+                    if result is left:
+                        result_owned = left_owned
+                    elif result is right:
+                        result_owned = right_owned
+                    else:
+                        result_owned = True
+                units.append(result)
+                owned.append(result_owned)
+            elif kind == _SCALAR:
+                units.append(self._memory.view_slot(step[1]))
+                owned.append(False)
+            else:
+                _, parse_unit, unit_start, unit_end, last, pending = step
+                ins.seek(unit_start)
+                units.append(parse_unit(ins))
+                owned.append(False)
+                if ins.tell() != unit_end:
+                    # the unit's extent has changed since compilation (e.g. DEF FN redefined)
+                    # carry on parsing from here in the usual way
+                    return self._parse(ins, units, deque(pending), last, None)
+        ins.seek(end)
+        return units[0]
+
+    def _parse(self, ins, units, operations, d, steps):
+        """Parse and evaluate expression from given state, optionally recording steps."""
+        final = True
+        # see https://en.wikipedia.org/wiki/Shunting-yard_algorithm
+        while True:
+            last = d
+            ins.skip_blank()
+            d = ins.read_keyword_token()
+            ins.seek(-len(d), 1)
+            if d == tk.NOT and not (last in op.OPERATORS or last == b''):
+                # unary NOT ends expression except after another operator or at start
+                break
+            elif d in op.OPERATORS:
+                ins.read(len(d))
+                # get combined operators such as >=
+                if d in op.COMBINABLE:
+                    nxt = ins.skip_blank()
+                    if nxt in op.COMBINABLE:
+                        d += ins.read(len(nxt))
+                if last in op.OPERATORS or last == b'' or d == tk.NOT:
+                    # also if last is ( but that leads to recursive call and last == ''
+                    nargs = 1
+                    # zero operands for a binary operator is always syntax error
+                    # because it will be seen as an illegal unary
+                    try:
+                        oper = op.UNARY[d]
+                        prec = op.PRECEDENCE[(d, nargs)]
+                    except KeyError:
+                        raise error.BASICError(error.STX)
+                else:
+                    nargs = 2
+                    try:
+                        oper = op.BINARY[d]
+                        prec = op.PRECEDENCE[(d, nargs)]
+                    except KeyError:
+                        # illegal combined ops like == raise syntax error here
+                        raise error.BASICError(error.STX)
+                    self._drain(prec, operations, units, steps)
+                operations.append((oper, nargs, prec))
+            elif not (last in op.OPERATORS or last == b''):
+                # repeated unit ends expression
+                # repeated literals or variables or non-keywords like 'AS'
+                break
+            elif d == b'(':
+                self._parse_unit(ins, self._parse_bracket, d, operations, units, steps)
+            elif d and d in LETTERS:
+                self._parse_unit(ins, self._parse_variable, d, operations, units, steps)
+            elif d in self._functions:
+                self._parse_unit(
+                    ins, partial(self._parse_function, token=d), d, operations, units, steps
+                )
+            elif d in tk.END_STATEMENT:
+                break
+            elif d in tk.END_EXPRESSION:
+                # missing operand inside brackets or before comma is syntax error
+                final = False
+                break
+            elif d == b'"':
+                self._parse_unit(ins, self.read_string_literal, d, operations, units, steps)
+            else:
+                self._parse_unit(ins, self.read_number_literal, d, operations, units, steps)
+        # raises IndexError for insufficient operators
+        try:
+            self._drain(0, operations, units, steps)
+            return units[0]
+        except IndexError:
+            # empty expression is a syntax error (inside brackets)
+            # or Missing Operand (in an assignment)
+            if final:
+                raise error.BASICError(error.MISSING_OPERAND)
+            raise error.BASICError(error.STX)
+
+    def _parse_unit(self, ins, parse_unit, d, operations, units, steps):
+        """Parse and evaluate a bracketed expression, variable, function or literal."""
+        start = ins.tell()
+        if parse_unit == self._parse_variable:
+            name = ins.read_name()
+            error.throw_if(not name, error.STX)
+            indices = self.parse_indices(ins)
+            # should make a shallow copy? but .clone here breaks circular MID$
+            units.append(self._memory.view_or_create_variable(name, indices))
+            if steps is not None and not indices:
+                # scalars can be looked up without going back to the code
+                steps.append((_SCALAR, self._memory.scalar_slot(name)))
+                return
+        else:
+            units.append(parse_unit(ins))
+        if steps is not None:
+            steps.append((_UNIT, parse_unit, start, ins.tell(), d, tuple(operations)))
+
+    def _parse_bracket(self, ins):
+        """Parse a bracketed sub-expression."""
+        ins.read(1)
+        # we need to create a new object or we'll overwrite our own stacks
+        # this will not be needed if we localise stacks in the expression parser
+        # either a separate class of just as local variables
+        value = self.parse(ins)
+        ins.require_read((b')',))
+        return value
+
+    def _parse_variable(self, ins):
+        """Parse a scalar variable or array element."""
+        name = ins.read_name()
+        error.throw_if(not name, error.STX)
+        indices = self.parse_indices(ins)
+        # should make a shallow copy? but .clone here breaks circular MID$
+        return self._memory.view_or_create_variable(name, indices)
 
-    def _drain(self, precedence, operations, units):
+    def _drain(self, precedence, operations, units, steps=None):
         """Drain evaluation stack until an operator of low precedence on top."""
         while operations:
             # this raises IndexError if there are not enough operators
@@ -329,6 +524,8 @@ class ExpressionParser(object):
             oper, narity, _ = operations.pop()
             args = reversed([units.pop() for _ in range(narity)])
             units.append(oper(*args))
+            if steps is not None:
+                steps.append((_APPLY, oper, narity))
 
     def read_string_literal(self, ins):
         """Read a quoted string literal (no leading blanks), return as String."""
@@ -342,7 +539,27 @@ class ExpressionParser(object):
 
     def read_number_literal(self, ins):
         """Return the value of a numeric literal (no leading blanks)."""
+        program = self._memory.program
         d = ins.peek()
+        if ins is not program.bytecode or d not in tk.NUMBER and d != tk.T_UINT:
+            return self._read_number_literal(ins, d)
+        # tokenised literals in the program are decoded once and then shared
+        # this is safe as expression values are never changed in-place, they may be variable views
+        if self._literals_revision != program.revision:
+            self._literals.clear()
+            self._literals_revision = program.revision
+        start = ins.tell()
+        try:
+            value, end = self._literals[start]
+        except KeyError:
+            value = self._read_number_literal(ins, d)
+            self._literals[start] = value, ins.tell()
+        else:
+            ins.seek(end)
+        return value
+
+    def _read_number_literal(self, ins, d):
+        """Decode a numeric literal starting with the given character."""
         # number literals as ASCII are accepted in tokenised streams. only if they start with a figure (not & or .)
         # this happens e.g. after non-keywords like AS. They are not acceptable as line numbers.
         if d in DIGITS:
@@ -6,6 +6,8 @@ Numeric and string operators
 This file is released under the GNU GPL version 3 or later.
 """
 
+import operator
+
 from ..base import tokens as tk
 from .. import values
 
@@ -74,3 +76,18 @@ BINARY = {
     tk.EQV: values.eqv_,
     tk.IMP: values.imp_,
 }
+
+# operators that have a Python float equivalent, for fast math
+# unary plus is the identity on numbers
+NATIVE_UNARY = {
+    values.neg: operator.neg,
+    UNARY[tk.O_PLUS]: None,
+}
+
+NATIVE_BINARY = {
+    values.pow: operator.pow,
+    values.mul: operator.mul,
+    values.div: operator.truediv,
+    values.add: operator.add,
+    values.sub: operator.sub,
+}
@@ -22,12 +22,18 @@ from . import userfunctions
 class Parser(object):
     """BASIC statement parser."""
 
-    def __init__(self, values, memory, syntax):
+    def __init__(self, values, memory, syntax, fast_math=False):
         """Initialise statement context."""
         # re-execute current statement after Break
         self.redo_on_break = False
+        self._memory = memory
+        # decoded statements in program code, by offset
+        self._statement_cache = {}
+        self._statement_cache_revision = None
+        # resolved scalar assignment targets in program code, by offset
+        self._targets = {}
         # expression parser
-        self.expression_parser = expressions.ExpressionParser(values, memory)
+        self.expression_parser = expressions.ExpressionParser(values, memory, fast_math)
         self.user_functions = self.expression_parser.user_functions
         # syntax: advanced, pcjr, tandy
         self._syntax = syntax
@@ -41,6 +47,12 @@ class Parser(object):
         pickle_dict['_simple'] = None
         pickle_dict['_complex'] = None
         pickle_dict['_callbacks'] = None
+        pickle_dict['_statement_cache'] = {}
+        pickle_dict['_targets'] = {}
+        pickle_dict['_statement_cache_revision'] = None
+        # drop the profiler's parse_statement wrapper: the profiler attaches again on unpickling
+        # and would otherwise wrap its own wrapper, recursing without end
+        pickle_dict.pop('parse_statement', None)
         return pickle_dict
 
     def __setstate__(self, pickle_dict):
@@ -55,6 +67,34 @@ class Parser(object):
 
     def parse_statement(self, ins):
         """Parse and execute a single statement."""
+        if ins is self._memory.program.bytecode:
+            c, parse_args = self._decode_program_statement(ins)
+        else:
+            c, parse_args = self._decode_statement(ins)
+        if c is not None:
+            self._callbacks[c](parse_args(ins))
+        # end-of-statement is checked at start of next statement in interpreter loop
+
+    def _decode_program_statement(self, ins):
+        """Decode a statement in program code, using the cache if possible."""
+        program = self._memory.program
+        if self._statement_cache_revision != program.revision:
+            self._statement_cache.clear()
+            self._targets.clear()
+            self._statement_cache_revision = program.revision
+        pos = ins.tell()
+        try:
+            c, parse_args, arg_pos = self._statement_cache[pos]
+        except KeyError:
+            c, parse_args = self._decode_statement(ins)
+            if c is not None:
+                self._statement_cache[pos] = c, parse_args, ins.tell()
+            return c, parse_args
+        ins.seek(arg_pos)
+        return c, parse_args
+
+    def _decode_statement(self, ins):
+        """Read the statement keyword; return callback key and argument parser."""
         # read keyword token or one byte
         ins.skip_blank()
         c = ins.read_keyword_token()
@@ -78,9 +118,8 @@ class Parser(object):
                 parse_args = self._simple[tk.LET]
             else:
                 ins.require_end()
-                return
-        self._callbacks[c](parse_args(ins))
-        # end-of-statement is checked at start of next statement in interpreter loop
+                return None, None
+        return c, parse_args
 
     def parse_name(self, ins):
         """Get scalar part of variable name from token stream."""
@@ -123,7 +162,7 @@ class Parser(object):
             tk.INPUT: self._parse_input,
             tk.DIM: self._parse_var_list,
             tk.READ: self._parse_var_list,
-            tk.LET: self._parse_let,
+            tk.LET: self._parse_assignment,
             tk.GOTO: self._parse_single_line_number,
             tk.RUN: self._parse_run,
             tk.IF: self._parse_if,
@@ -1200,6 +1239,30 @@ class Parser(object):
         # as it would delete the new string generated by let if applied to a code literal
         yield self.parse_expression(ins)
 
+    def _parse_assignment(self, ins):
+        """Parse LET syntax."""
+        if ins is self._memory.program.bytecode:
+            yield self._parse_target(ins)
+        else:
+            yield self._parse_variable(ins)
+        ins.require_read((tk.O_EQ,))
+        yield self.parse_expression(ins)
+
+    def _parse_target(self, ins):
+        """Parse assignment target in program code; resolve scalars to a slot."""
+        pos = ins.tell()
+        try:
+            slot, end = self._targets[pos]
+        except KeyError:
+            name, indices = self._parse_variable(ins)
+            if indices:
+                return name, indices
+            slot = self._memory.scalar_slot(name)
+            self._targets[pos] = slot, ins.tell()
+            return slot
+        ins.seek(end)
+        return slot
+
     def _parse_mid(self, ins):
         """Parse MID$ syntax."""
         # do not use require_read as we don't allow whitespace here
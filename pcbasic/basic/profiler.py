@@ -0,0 +1,197 @@
+"""
+PC-BASIC - profiler.py
+Execution profiler for BASIC programs
+
+(c) 2013--2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import time
+import json
+import struct
+
+from ..compat import iteritems
+from .base import tokens as tk
+
+
+# frame name for the main program in stack traces
+MAIN_FRAME = u'main'
+
+
+class Profiler(object):
+    """Record hit counts and time spent per program line, statement keyword and GOSUB stack."""
+
+    def __init__(self, program, token_keyword):
+        """Initialise profiler."""
+        self._program = program
+        self._token_keyword = token_keyword
+        self._interpreter = None
+        self._parse_statement = None
+        self._step = None
+        self.reset()
+
+    def __getstate__(self):
+        """Pickle."""
+        pickle_dict = self.__dict__.copy()
+        # hooks are re-attached on unpickling
+        pickle_dict['_interpreter'] = None
+        pickle_dict['_parse_statement'] = None
+        pickle_dict['_step'] = None
+        return pickle_dict
+
+    def reset(self):
+        """Discard the recorded profile."""
+        # line number -> number of times the line was entered at its start
+        self._hits = {}
+        # line number -> number of statements executed and seconds spent
+        self._line_counts = {}
+        self._line_times = {}
+        # keyword token -> number of statements executed and seconds spent
+        self._keyword_counts = {}
+        self._keyword_times = {}
+        # tuple of subroutine entry lines and current line -> seconds spent
+        self._stack_times = {}
+        # entry lines of active GOSUB subroutines
+        self._frames = []
+        # program position -> line number
+        self._line_at = {}
+        self._line_at_revision = None
+
+    def attach(self, interpreter, parser):
+        """Hook into the interpreter's line step and the parser's statement execution."""
+        self._interpreter = interpreter
+        self._step = interpreter.step
+        interpreter.step = self._profile_step
+        self._parse_statement = parser.parse_statement
+        parser.parse_statement = self._profile_statement
+
+    def _profile_step(self, token):
+        """Count a new program line."""
+        line, = struct.unpack_from('<H', token, 2)
+        self._hits[line] = self._hits.get(line, 0) + 1
+        self._step(token)
+
+    def _get_line_number(self, pos):
+        """Line number for a program position, cached until the program changes."""
+        if self._line_at_revision != self._program.revision:
+            self._line_at = {}
+            self._line_at_revision = self._program.revision
+        try:
+            return self._line_at[pos]
+        except KeyError:
+            line = self._line_at[pos] = self._program.get_line_number(pos)
+            return line
+
+    def _profile_statement(self, ins):
+        """Execute a statement and record the time it takes."""
+        interpreter = self._interpreter
+        if not interpreter.run_mode:
+            # only profile program code
+            return self._parse_statement(ins)
+        pos = ins.tell()
+        ins.skip_blank()
+        keyword = ins.read_keyword_token()
+        ins.seek(pos)
+        line = self._get_line_number(pos)
+        # follow GOSUB and RETURN: a new subroutine frame starts at the first line executed
+        depth = len(interpreter.gosub_stack)
+        if depth != len(self._frames):
+            del self._frames[depth:]
+            self._frames.extend([line] * (depth - len(self._frames)))
+        stack = tuple(self._frames) + (line,)
+        start = time.time()
+        try:
+            self._parse_statement(ins)
+        finally:
+            elapsed = time.time() - start
+            self._line_counts[line] = self._line_counts.get(line, 0) + 1
+            self._line_times[line] = self._line_times.get(line, 0) + elapsed
+            if keyword not in tk.END_STATEMENT:
+                self._keyword_counts[keyword] = self._keyword_counts.get(keyword, 0) + 1
+                self._keyword_times[keyword] = self._keyword_times.get(keyword, 0) + elapsed
+            self._stack_times[stack] = self._stack_times.get(stack, 0) + elapsed
+
+    def _keyword_name(self, token):
+        """Statement name for a keyword token."""
+        try:
+            return self._token_keyword.to_keyword[token].decode('ascii')
+        except KeyError:
+            if token.isalpha():
+                # implicit LET
+                return tk.KW_LET.decode('ascii')
+            return token.decode('latin-1')
+
+    ###########################################################################
+    # output
+
+    def get_stats(self):
+        """Profile as a dictionary of line, keyword and stack records, slowest first."""
+        lines = sorted(set(self._hits) | set(self._line_counts))
+        keywords = {}
+        for token, count in iteritems(self._keyword_counts):
+            name = self._keyword_name(token)
+            stats = keywords.setdefault(name, {u'keyword': name, u'statements': 0, u'time': 0.})
+            stats[u'statements'] += count
+            stats[u'time'] += self._keyword_times[token]
+        return {
+            u'lines': sorted((
+                    {
+                        u'line': _line,
+                        u'hits': self._hits.get(_line, 0),
+                        u'statements': self._line_counts.get(_line, 0),
+                        u'time': self._line_times.get(_line, 0.),
+                    }
+                    for _line in lines
+                ),
+                key=lambda _rec: (-_rec[u'time'], _rec[u'line'])
+            ),
+            u'keywords': sorted(
+                keywords.values(), key=lambda _rec: (-_rec[u'time'], _rec[u'keyword'])
+            ),
+            u'stacks': sorted((
+                    {u'stack': list(_stack), u'time': _time}
+                    for _stack, _time in iteritems(self._stack_times)
+                ),
+                key=lambda _rec: (-_rec[u'time'], _rec[u'stack'])
+            ),
+        }
+
+    def get_json(self):
+        """Profile in JSON format."""
+        return u'%s\n' % (json.dumps(self.get_stats(), indent=2),)
+
+    def get_collapsed(self):
+        """Profile in collapsed-stack format for flame graphs, in microseconds."""
+        return u''.join(
+            u'%s %d\n' % (
+                u';'.join(
+                    [MAIN_FRAME]
+                    + [u'GOSUB %d' % (_line,) for _line in _stack[:-1]]
+                    + [u'%d' % (_stack[-1],)]
+                ),
+                round(_time * 1e6)
+            )
+            for _stack, _time in sorted(iteritems(self._stack_times))
+        )
+
+    def get_report(self, max_rows=20):
+        """Profile as a text report of the slowest lines and keywords."""
+        stats = self.get_stats()
+        total = sum(_rec[u'time'] for _rec in stats[u'lines']) or 1.
+        report = [u'%6s %10s %12s %12s %7s' % (u'LINE', u'HITS', u'STATEMENTS', u'TIME (s)', u'%')]
+        report.extend(
+            u'%6d %10d %12d %12.6f %7.2f' % (
+                _rec[u'line'], _rec[u'hits'], _rec[u'statements'],
+                _rec[u'time'], 100. * _rec[u'time'] / total
+            )
+            for _rec in stats[u'lines'][:max_rows]
+        )
+        report.append(u'')
+        report.append(u'%-8s %20s %12s %7s' % (u'KEYWORD', u'STATEMENTS', u'TIME (s)', u'%'))
+        report.extend(
+            u'%-8s %20d %12.6f %7.2f' % (
+                _rec[u'keyword'], _rec[u'statements'], _rec[u'time'], 100. * _rec[u'time'] / total
+            )
+            for _rec in stats[u'keywords'][:max_rows]
+        )
+        return u'\n'.join(report) + u'\n'
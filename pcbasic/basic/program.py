@@ -9,9 +9,11 @@ This file is released under the GNU GPL version 3 or later.
 import binascii
 import logging
 import struct
+import re
 import io
+from bisect import bisect_right
 
-from ..compat import int2byte
+from ..compat import int2byte, iteritems, itervalues
 
 from .base import error
 from .base import tokens as tk
@@ -19,20 +21,39 @@ from . import values
 from . import converter
 
 
+# scanner for line number references: line headers, string literals, comments and
+# number tokens are matched as a whole so that their contents are not mistaken for a reference
+JUMP_SCAN = re.compile(
+    b'(' + re.escape(tk.T_UINT) + b').{2}'
+    b'|"[^"\0]*"?'
+    b'|' + re.escape(tk.REM) + b'[^\0]*'
+    b'|\0.{4}'
+    b'|[' + re.escape(tk.T_OCT + tk.T_HEX + tk.T_UINT_PROC + tk.T_INT) + b'].{2}'
+    b'|[' + re.escape(tk.T_BYTE) + b'\xfd-\xff].'
+    b'|' + re.escape(tk.T_SINGLE) + b'.{4}'
+    b'|' + re.escape(tk.T_DOUBLE) + b'.{8}',
+    re.DOTALL
+)
+
 class Program(object):
     """BASIC program."""
 
     def __init__(self, tokeniser, lister, hide_listing,
-                allow_protect, allow_code_poke, memory, bytecode, rebuild_offsets):
+                allow_protect, allow_code_poke, memory, bytecode, rebuild_offsets,
+                program_cache=None):
         """Initialise program."""
         self._memory = memory
         # program bytecode buffer
         self.bytecode = bytecode
+        # incremented whenever the bytecode changes, to invalidate derived caches
+        self.revision = 0
         self.erase()
         self.max_list_line = hide_listing if hide_listing else 65535
         self.allow_protect = allow_protect
         self.allow_code_poke = allow_code_poke
         self._rebuild_offsets = rebuild_offsets
+        # persistent cache of tokenised plain-text programs, if any
+        self._program_cache = program_cache
         # to be set when file memory is initialised
         self.code_start = memory.code_start
         # for detokenise_line()
@@ -70,12 +91,24 @@ class Program(object):
         """Size of code space """
         return self.code_size
 
+    def touch(self):
+        """Mark the program code as changed."""
+        self.revision += 1
+        # FOR/NEXT and WHILE/WEND pairs, by position after the opening keyword
+        self._block_ends = {}
+        # next DATA statement, by position of the preceding statement end
+        self._next_data = {}
+        # positions of line number references
+        self._jump_refs = None
+
     def erase(self):
         """Erase the program from memory."""
+        self.touch()
         self.bytecode.seek(0)
         self.bytecode.write(b'\0\0\0')
         self.protected = False
         self.line_numbers = {65536: 0}
+        self._line_index = None
         self.last_stored = None
         self.code_size = self.bytecode.tell()
         self.bytecode.truncate()
@@ -93,18 +126,59 @@ class Program(object):
 
     def get_line_number(self, pos):
         """Get line number for stream position."""
-        pre = -1
         if pos is None:
             pos = -1
-        for linum in self.line_numbers:
-            linum_pos = self.line_numbers[linum]
-            if linum_pos <= pos and linum > pre:
-                pre = linum
-        return pre
+        if self._line_index is None:
+            self._build_line_index()
+        offsets, line_max = self._line_index
+        index = bisect_right(offsets, pos)
+        if not index:
+            return -1
+        return line_max[index-1]
+
+    def _build_line_index(self):
+        """Build sorted index of line offsets, with highest line number at or before each."""
+        offsets, line_max = [], []
+        top = -1
+        for pos, linum in sorted((_pos, _linum) for _linum, _pos in iteritems(self.line_numbers)):
+            # a loaded bytecode file may have its lines out of order
+            top = max(top, linum)
+            offsets.append(pos)
+            line_max.append(top)
+        self._line_index = offsets, line_max
+
+    def get_jump_references(self):
+        """Positions of all line number reference tokens, in order."""
+        if self._jump_refs is None:
+            code = self.bytecode.getvalue()[:self.line_numbers[65536]]
+            self._jump_refs = [
+                _match.start() for _match in JUMP_SCAN.finditer(code) if _match.group(1)
+            ]
+        return self._jump_refs
+
+    def skip_block(self, for_char, next_char, allow_comma=False):
+        """Skip over bytecode until block end token; remember where the block ends."""
+        key = self.bytecode.tell(), for_char
+        try:
+            self.bytecode.seek(self._block_ends[key])
+        except KeyError:
+            self.bytecode.skip_block(for_char, next_char, allow_comma)
+            self._block_ends[key] = self.bytecode.tell()
+
+    def skip_to_data(self):
+        """Skip over bytecode to the next DATA statement; remember where it is."""
+        pos = self.bytecode.tell()
+        try:
+            self.bytecode.seek(self._next_data[pos])
+        except KeyError:
+            self.bytecode.skip_to_token(tk.DATA)
+            self._next_data[pos] = self.bytecode.tell()
 
     def rebuild_line_dict(self):
         """Preparse to build line number dictionary."""
+        self.touch()
         self.line_numbers, offsets = {}, []
+        self._line_index = None
         self.bytecode.seek(0)
         scanline, scanpos, last = 0, 0, 0
         while True:
@@ -155,6 +229,7 @@ class Program(object):
             del self.line_numbers[key]
         for key in beyond:
             self.line_numbers[key] += length
+        self._line_index = None
 
     def check_number_start(self, linebuf):
         """Check if the given line buffer starts with a line number."""
@@ -181,6 +256,7 @@ class Program(object):
         pos, afterpos, deleteable, beyond = self.find_pos_line_dict(scanline, scanline)
         if empty and not deleteable:
             raise error.BASICError(error.UNDEFINED_LINE_NUMBER)
+        self.touch()
         # read the remainder of the program into a buffer to be pasted back after the write
         self.bytecode.seek(afterpos)
         rest = self.bytecode.read()
@@ -205,6 +281,7 @@ class Program(object):
         self.update_line_dict(pos, afterpos, length, deleteable, beyond)
         if not empty:
             self.line_numbers[scanline] = pos
+            self._line_index = None
         self.last_stored = scanline
 
     def find_pos_line_dict(self, fromline, toline):
@@ -229,13 +306,20 @@ class Program(object):
         if not deleteable:
             # no lines selected
             raise error.BASICError(error.IFC)
+        jump_refs = self._jump_refs
         # do the delete
+        self.touch()
         self.bytecode.seek(afterpos)
         rest = self.bytecode.read()
         self.bytecode.seek(startpos)
         self.truncate(rest)
         # update line number dict
         self.update_line_dict(startpos, afterpos, 0, deleteable, beyond)
+        # references in the remaining lines only move
+        if jump_refs is not None:
+            self._jump_refs = [_pos for _pos in jump_refs if _pos < startpos] + [
+                _pos - (afterpos - startpos) for _pos in jump_refs if _pos >= afterpos
+            ]
 
     def edit(self, console, from_line, target_bytepos):
         """Output program line to console and position cursor."""
@@ -277,7 +361,10 @@ class Program(object):
             old_to_new[old_line] = new_line
             self.last_stored = new_line
             new_line += step
+        # line number references do not move, so the index stays valid
+        jump_refs = self.get_jump_references()
         # write the new numbers
+        self.touch()
         for old_line in old_to_new:
             self.bytecode.seek(self.line_numbers[old_line])
             # skip the \x00\xC0\xDE & overwrite line number
@@ -285,36 +372,34 @@ class Program(object):
             self.bytecode.write(struct.pack('<H', old_to_new[old_line]))
         # write the indirect line numbers
         ins = self.bytecode
-        ins.seek(0)
-        while ins.skip_to_read((tk.T_UINT,)) == tk.T_UINT:
+        for pos in jump_refs:
             # get the old g number
-            token = ins.read(2)
-            jumpnum, = struct.unpack('<H', token)
+            ins.seek(pos + 1)
+            jumpnum, = struct.unpack('<H', ins.read(2))
             # handle exception for ERROR GOTO
             if jumpnum == 0:
-                pos = ins.tell()
-                # skip line number token
-                ins.seek(-3, 1)
+                # look back from the line number token
+                ins.seek(pos)
                 if ins.backskip_blank() == tk.GOTO and ins.backskip_blank() == tk.ERROR:
-                    ins.seek(pos)
                     continue
-                ins.seek(pos)
             try:
                 newjump = old_to_new[jumpnum]
             except KeyError:
                 # not redefined, exists in program?
                 if jumpnum not in self.line_numbers:
-                    linum = self.get_line_number(ins.tell()-1)
+                    linum = self.get_line_number(pos + 2)
                     console.write_line(b'Undefined line %d in %d' % (jumpnum, linum))
                 newjump = jumpnum
-            ins.seek(-2, 1)
+            ins.seek(pos + 1)
             ins.write(struct.pack('<H', newjump))
+        self._jump_refs = jump_refs
         # rebuild the line number dictionary
         new_lines = {}
         for old_line in old_to_new:
             new_lines[old_to_new[old_line]] = self.line_numbers[old_line]
             del self.line_numbers[old_line]
         self.line_numbers.update(new_lines)
+        self._line_index = None
         return old_to_new
 
     def load(self, g):
@@ -336,7 +421,10 @@ class Program(object):
             # or it'll end up after the new code in memory
             self.bytecode.truncate()
             # anything but numbers or whitespace: Direct Statement in File
-            self.merge(g)
+            if self._program_cache is None:
+                self.merge(g)
+            else:
+                self._load_cached(list(_read_source(g)))
         else:
             logging.debug('Incorrect file type `%s` on LOAD', g.filetype)
         # rebuild line number dict and offsets
@@ -344,25 +432,116 @@ class Program(object):
             self.rebuild_line_dict()
         self.code_size = self.bytecode.tell()
 
+    def _load_cached(self, source):
+        """Load program from plain-text lines, through the program cache."""
+        key = self._program_cache.get_key(source, self.code_start, self._memory.stack_start())
+        entry = self._program_cache.get(key)
+        if entry is None:
+            self._merge_source(source)
+            self._program_cache.put(
+                key, self.bytecode.getvalue(), self.line_numbers, self.last_stored
+            )
+        else:
+            image, self.line_numbers, self.last_stored = entry
+            self.touch()
+            self._line_index = None
+            self.bytecode.seek(0)
+            self.truncate(image)
+
     def merge(self, g):
         """Merge program from ascii or utf8 (if utf8_files is True) stream."""
-        while True:
-            line, cr = g.read_line()
-            if not line and not cr:
-                # end of file
-                break
-            elif cr is None:
+        self._merge_source(_read_source(g))
+
+    def _merge_source(self, source):
+        """Merge program from plain-text lines."""
+        lines, tail = self._split_lines()
+        if lines is None:
+            # lines are not stored in order, e.g. from a bytecode file; insert one by one
+            for linebuf in self._tokenise_lines(source):
+                self.store_line(linebuf)
+            return
+        # collect the merged lines and write the program once, also if we stop on an error
+        top = max(lines) if lines else -1
+        size = sum(3 + len(_body) for _body, _ in itervalues(lines))
+        changed = False
+        try:
+            for linebuf in self._tokenise_lines(source):
+                if self.protected:
+                    raise error.BASICError(error.IFC)
+                linebuf.seek(1)
+                scanline = self.lister.detokenise_line_number(linebuf)
+                if linebuf.skip_blank_read() in tk.END_LINE:
+                    # empty line: delete
+                    if scanline not in lines:
+                        raise error.BASICError(error.UNDEFINED_LINE_NUMBER)
+                    size -= 3 + len(lines.pop(scanline)[0])
+                else:
+                    body = linebuf.getvalue()[3:]
+                    # position the line will be stored at
+                    if scanline > top:
+                        pos = size
+                    else:
+                        pos = sum(
+                            3 + len(_body) for _line, (_body, _) in iteritems(lines)
+                            if _line < scanline
+                        )
+                    if self.code_start + 4 + pos + len(body) > self._memory.stack_start():
+                        raise error.BASICError(error.OUT_OF_MEMORY)
+                    if scanline in lines:
+                        size -= 3 + len(lines[scanline][0])
+                    size += 3 + len(body)
+                    lines[scanline] = body, self.code_start + 4 + len(body)
+                    top = max(top, scanline)
+                changed = True
+                self.last_stored = scanline
+        finally:
+            if changed:
+                self._join_lines(lines, tail)
+
+    def _tokenise_lines(self, source):
+        """Tokenise plain-text program lines."""
+        for line, cr in source:
+            if cr is None:
                 # line > 255 chars
                 raise error.BASICError(error.LINE_BUFFER_OVERFLOW)
             linebuf = self.tokeniser.tokenise_line(line)
             if linebuf.read(1) == b'\0':
-                # line starts with a number, add to program memory; store_line seeks to 1 first
-                self.store_line(linebuf)
+                # line starts with a number, add to program memory
+                yield linebuf
             else:
                 # we have read the :
                 if linebuf.skip_blank() not in tk.END_LINE:
                     raise error.BASICError(error.DIRECT_STATEMENT_IN_FILE)
 
+    def _split_lines(self):
+        """Split program into line bodies and link offsets, by line number; None if out of order."""
+        code = self.bytecode.getvalue()
+        positions = sorted(iteritems(self.line_numbers))
+        lines, last = {}, 0
+        for (scanline, pos), (_, next_pos) in zip(positions, positions[1:]):
+            if pos != last or next_pos <= pos:
+                return None, None
+            # keep the link relative to the line position, as store_line does
+            link, = struct.unpack_from('<H', code, pos + 1)
+            lines[scanline] = code[pos+3:next_pos], link - pos
+            last = next_pos
+        return lines, code[last:]
+
+    def _join_lines(self, lines, tail):
+        """Write program from line bodies and link offsets, followed by the given tail."""
+        self.touch()
+        self.line_numbers = {}
+        self._line_index = None
+        self.bytecode.seek(0)
+        pos = 0
+        for scanline in sorted(lines):
+            body, link = lines[scanline]
+            self.bytecode.write(struct.pack('<BH', 0, pos + link) + body)
+            self.line_numbers[scanline] = pos
+            pos += 3 + len(body)
+        self.line_numbers[65536] = pos
+        self.truncate(tail)
+
     def save(self, g):
         """Save the program to stream g in (A)scii, (B)ytecode or (P)rotected mode."""
         mode = g.filetype
@@ -451,3 +630,13 @@ class Program(object):
             self.rebuild_line_dict()
         # restore program pointer
         self.bytecode.seek(loc)
+
+
+def _read_source(g):
+    """Read the lines of a plain-text program stream."""
+    while True:
+        line, cr = g.read_line()
+        if not line and not cr:
+            # end of file
+            break
+        yield line, cr
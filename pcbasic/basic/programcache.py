@@ -0,0 +1,135 @@
+"""
+PC-BASIC - programcache.py
+Persistent cache of tokenised plain-text programs
+
+(c) 2013--2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import os
+import zlib
+import struct
+import hashlib
+import logging
+import tempfile
+
+
+# increment this if we change the format of cache entries
+FORMAT_VERSION = 1
+# entry header: magic, checksum, format version, last stored line number, number of lines
+HEADER_FORMAT = '<4sLLlL'
+MAGIC = b'PCBT'
+# file name suffix of cache entries
+SUFFIX = '.pcbt'
+
+
+class ProgramCache(object):
+    """On-disk cache of tokenised program images with least-recently-used eviction."""
+
+    def __init__(self, path, max_size, settings):
+        """Initialise the cache in a directory, up to max_size bytes; settings affect tokenising."""
+        self._path = path
+        self._max_size = max_size
+        self._settings = settings
+
+    def get_key(self, lines, code_start, stack_start):
+        """Cache key for the lines of a plain-text program and the memory layout."""
+        digest = hashlib.sha256(b'%s %d %d\n' % (self._settings, code_start, stack_start))
+        for line, cr in lines:
+            digest.update(struct.pack('<H', len(line)) + line + (cr or b''))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Retrieve program image, line number dictionary and last stored line; None if absent."""
+        name = os.path.join(self._path, key + SUFFIX)
+        try:
+            with open(name, 'rb') as f:
+                data = f.read()
+        except EnvironmentError:
+            return None
+        try:
+            entry = _unpack_entry(data)
+        except ValueError as e:
+            logging.debug('Ignoring program cache entry %s: %s', name, e)
+            return None
+        # mark as recently used; fails on read-only mounts, where the cache is not evicted anyway
+        try:
+            os.utime(name, None)
+        except EnvironmentError:
+            pass
+        return entry
+
+    def put(self, key, image, line_numbers, last_stored):
+        """Store program image, line number dictionary and last stored line."""
+        name = os.path.join(self._path, key + SUFFIX)
+        data = _pack_entry(image, line_numbers, last_stored)
+        try:
+            if not os.path.isdir(self._path):
+                os.makedirs(self._path)
+            # write to a temporary file first so that readers never see a partial entry
+            fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=self._path)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                # temporary files are private; entries may be shared, e.g. on a read-only mount
+                os.chmod(temp_name, 0o644)
+                getattr(os, 'replace', os.rename)(temp_name, name)
+            except EnvironmentError:
+                os.remove(temp_name)
+                raise
+            self._evict()
+        except EnvironmentError as e:
+            logging.debug('Could not store program cache entry %s: %s', name, e)
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its maximum size."""
+        entries = []
+        for name in os.listdir(self._path):
+            if name.endswith(SUFFIX):
+                path = os.path.join(self._path, name)
+                try:
+                    stat = os.stat(path)
+                except EnvironmentError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(_size for _, _size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self._max_size:
+                break
+            try:
+                os.remove(path)
+            except EnvironmentError:
+                pass
+            total -= size
+
+
+def _pack_entry(image, line_numbers, last_stored):
+    """Convert a program image and line number dictionary to a cache entry."""
+    lines = sorted(line_numbers.items())
+    table = struct.pack('<%dL' % (2*len(lines),), *(_n for _line in lines for _n in _line))
+    payload = table + bytes(image)
+    header = struct.pack(
+        HEADER_FORMAT, MAGIC, zlib.crc32(payload) & 0xffffffff, FORMAT_VERSION,
+        -1 if last_stored is None else last_stored, len(lines)
+    )
+    return header + payload
+
+def _unpack_entry(data):
+    """Convert a cache entry to program image, line number dictionary and last stored line."""
+    size = struct.calcsize(HEADER_FORMAT)
+    try:
+        magic, checksum, version, last_stored, count = struct.unpack(HEADER_FORMAT, data[:size])
+    except struct.error:
+        raise ValueError('entry header truncated')
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('not a program cache entry of this version')
+    payload = data[size:]
+    # mask checksum to deal with different signs on Py2/Py3
+    if zlib.crc32(payload) & 0xffffffff != checksum:
+        raise ValueError('entry corrupted')
+    table_size = struct.calcsize('<%dL' % (2*count,))
+    if len(payload) <= table_size:
+        raise ValueError('entry truncated')
+    table = struct.unpack_from('<%dL' % (2*count,), payload)
+    line_numbers = dict(zip(table[::2], table[1::2]))
+    return payload[table_size:], line_numbers, (None if last_stored == -1 else last_stored)
@@ -0,0 +1,167 @@
+"""
+PC-BASIC - mbf.py
+Batch conversion between buffers of BASIC numbers and Python numbers
+
+(c) 2013--2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import math
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..base import error
+from . import numbers
+
+
+# float types by sigil
+FLOAT_CLASSES = {
+    numbers.Single.sigil: numbers.Single,
+    numbers.Double.sigil: numbers.Double,
+}
+
+# struct format characters and numpy types for whole-word access
+_WORD_FORMATS = {numbers.Single: 'L', numbers.Double: 'Q'}
+_WORD_DTYPES = {numbers.Single: '<u4', numbers.Double: '<u8'}
+
+# scale factors by exponent byte; exponent 0 means the value is zero
+_SCALES = {
+    _cls: [0.] + [2.**(_exp - _cls._bias) for _exp in range(1, 256)]
+    for _cls in FLOAT_CLASSES.values()
+}
+
+# numpy is only worth its overhead on larger buffers
+NUMPY_THRESHOLD = 64
+
+
+def decode(sigil, buffer):
+    """Convert a buffer of Integer, Single or Double values to a list of Python numbers."""
+    if sigil == numbers.Integer.sigil:
+        return list(struct.unpack('<%dh' % (len(buffer) // 2,), buffer))
+    cls = FLOAT_CLASSES[sigil]
+    if numpy and len(buffer) >= NUMPY_THRESHOLD * cls.size:
+        return _decode_numpy(cls, buffer)
+    return _decode(cls, buffer)
+
+def encode(sigil, python_list, values):
+    """Convert a sequence of Python numbers to a buffer of Integer, Single or Double values."""
+    if sigil == numbers.Integer.sigil:
+        return _encode_integers(python_list)
+    cls = FLOAT_CLASSES[sigil]
+    if numpy and len(python_list) >= NUMPY_THRESHOLD:
+        in_array = numpy.asarray(python_list)
+        # leave infinities and type errors to the per-value conversion
+        if in_array.dtype.kind in 'iuf' and numpy.isfinite(in_array).all():
+            return _encode_numpy(cls, in_array.astype(numpy.float64), values)
+    return _encode(cls, python_list, values)
+
+
+def _encode_integers(python_list):
+    """Convert Python ints to Integer buffer."""
+    if numpy and len(python_list) >= NUMPY_THRESHOLD:
+        in_array = numpy.asarray(python_list)
+        if in_array.dtype.kind in 'iu':
+            if (in_array < -0x8000).any() or (in_array > 0x7fff).any():
+                raise error.BASICError(error.OVERFLOW)
+            return in_array.astype('<i2').tobytes()
+    if len(python_list) and (min(python_list) < -0x8000 or max(python_list) > 0x7fff):
+        raise error.BASICError(error.OVERFLOW)
+    return struct.pack('<%dh' % (len(python_list),), *python_list)
+
+def _encode_out_of_range(cls, value, values):
+    """Handle a value beyond the MBF range as Float.from_value does; return the signed maximum word."""
+    if value != value:
+        # nan: Illegal function call
+        values.error_handler.handle(ValueError(value))
+    number = cls(None, values).from_bytes(cls.neg_max if value < 0 else cls.pos_max)
+    # writes the Overflow message, or raises Overflow if errors are trapped
+    values.error_handler.handle(OverflowError(number))
+    word, = struct.unpack('<' + _WORD_FORMATS[cls], number.to_bytes())
+    return word
+
+def _decode(cls, buffer):
+    """Convert MBF buffer to Python floats, as Float.to_value does for each value."""
+    words = struct.unpack('<%d%s' % (len(buffer) // cls.size, _WORD_FORMATS[cls]), buffer)
+    scales, shift = _SCALES[cls], cls._exp_shift
+    mask, signmask = cls._mask, cls._signmask
+    return [
+        (-(_word & mask) if _word & signmask else (_word & mask) | signmask) * scales[_word >> shift]
+        if _word >> shift else 0.
+        for _word in words
+    ]
+
+def _encode(cls, python_list, values):
+    """Convert Python numbers to MBF buffer, as Float.from_value does for each value."""
+    bits, shift = cls._exp_shift, cls._shift
+    words = []
+    for value in python_list:
+        if value == 0:
+            words.append(0)
+            continue
+        try:
+            mantissa, exp = math.frexp(abs(value))
+        except OverflowError:
+            # int too large for a Python float
+            mantissa, exp = 0., 256
+        if exp + 128 > 255 or not 0.5 <= mantissa < 1:
+            # overflow, infinity or nan
+            words.append(_encode_out_of_range(cls, value, values))
+            continue
+        elif exp + 128 <= 0:
+            # underflow to zero
+            words.append(0)
+            continue
+        man = int(math.ldexp(mantissa, bits))
+        # Float.from_value estimates the exponent through a logarithm and truncates
+        # if the estimate is too high, bits get lost before the mantissa is shifted into place
+        lost = int(math.log(abs(value), 2) - shift) - (exp - bits)
+        if lost > 0:
+            man = man >> lost << lost
+        if value < 0:
+            man |= cls._signmask
+        else:
+            man &= cls._posmask
+        words.append(man | ((exp + 128) << bits))
+    return struct.pack('<%d%s' % (len(words), _WORD_FORMATS[cls]), *words)
+
+def _decode_numpy(cls, buffer):
+    """Convert MBF buffer to Python floats, using numpy."""
+    words = numpy.frombuffer(buffer, dtype=_WORD_DTYPES[cls])
+    exps = (words >> cls._exp_shift).astype(numpy.int64)
+    mantissas = ((words & cls._posmask) | cls._signmask).astype(numpy.float64)
+    out = numpy.ldexp(mantissas, exps - cls._bias)
+    out[(words & cls._signmask) != 0] *= -1
+    out[exps == 0] = 0.
+    return out.tolist()
+
+def _encode_numpy(cls, in_array, values):
+    """Convert numpy array of finite floats to MBF buffer, as Float.from_value does for each value."""
+    bits, shift = cls._exp_shift, cls._shift
+    absolute = numpy.abs(in_array)
+    mantissas, exps = numpy.frexp(absolute)
+    nonzero = absolute != 0
+    overflow = nonzero & (exps + 128 > 255)
+    man = numpy.ldexp(mantissas, bits).astype(numpy.uint64)
+    # see _encode; the logarithm may differ in the last place from Python's
+    # so we recalculate the truncated exponent with math.log if it's close to an integer
+    # zeros give infinite estimates, these are replaced at the end
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        estimates = numpy.log(absolute) / math.log(2) - shift
+        lost = numpy.trunc(estimates) - (exps - bits)
+        ambiguous = nonzero & (numpy.abs(estimates - numpy.round(estimates)) < 1e-6)
+    for index in numpy.flatnonzero(ambiguous):
+        lost[index] = int(math.log(absolute[index], 2) - shift) - (exps[index] - bits)
+    lost = numpy.clip(lost, 0, bits).astype(numpy.uint64)
+    man = man >> lost << lost
+    man = numpy.where(in_array < 0, man | cls._signmask, man & cls._posmask)
+    words = man | (numpy.clip(exps + 128, 0, 255).astype(numpy.uint64) << numpy.uint64(bits))
+    # zero and underflow
+    words[~nonzero | (exps + 128 <= 0)] = 0
+    # overflow is handled value by value, in order
+    for index in numpy.flatnonzero(overflow):
+        words[index] = _encode_out_of_range(cls, in_array[index].item(), values)
+    return words.astype(_WORD_DTYPES[cls]).tobytes()
@@ -26,7 +26,7 @@ import binascii
 import struct
 import math
 
-from ...compat import iterchar, int2byte
+from ...compat import iterchar, int2byte, iteritems
 
 from ..base import tokens as tk
 from ..base import error
@@ -39,6 +39,22 @@ BLANKS = b' \t\n'
 SEPARATORS = b'\x1c\x1d\x1f'
 
 
+def _build_truncated_sums():
+    """Sums subtracted in eight steps of long division, for all 7-bit divisor tails."""
+    # entry [tail << 8 | byte] is the sum of (tail >> i) over the bits 2**(7-i) set in byte
+    sums = bytearray()
+    for tail in range(0x80):
+        row = [0]
+        for shift in range(7, -1, -1):
+            step = tail >> shift
+            row += [_sum + step for _sum in row]
+        sums.extend(row)
+    return sums
+
+# for _div_den
+TRUNCATED_SUMS = _build_truncated_sums()
+
+
 
 ##############################################################################
 # value base class
@@ -46,6 +62,8 @@ SEPARATORS = b'\x1c\x1d\x1f'
 class Value(object):
     """Abstract base class for value types."""
 
+    __slots__ = ('_buffer', '_values')
+
     sigil = None
     size = None
 
@@ -67,13 +85,18 @@ class Value(object):
             return '%s[%s <detached>]' % (self.sigil, binascii.hexlify(self.to_bytes()))
 
     def __getstate__(self):
+        pickle_dict = {
+            _name: getattr(self, _name)
+            for _cls in type(self).__mro__ for _name in getattr(_cls, '__slots__', ())
+        }
         # can't pickle memoryview
-        self._buffer = bytearray(self._buffer)
-        return self.__dict__
+        pickle_dict['_buffer'] = bytearray(self._buffer)
+        return pickle_dict
 
     def __setstate__(self, pickle_dict):
+        for name, value in iteritems(pickle_dict):
+            setattr(self, name, value)
         # can't pickle memoryview
-        self.__dict__ = pickle_dict
         self._buffer = memoryview(self._buffer)
 
     def to_value(self):
@@ -81,11 +104,11 @@ class Value(object):
 
     def clone(self):
         """Create a copy."""
-        return self.__class__(None, self._values).from_bytes(self._buffer)
+        return self._values.allocate(self.__class__).from_bytes(self._buffer)
 
     def new(self):
         """Create a new null value."""
-        return self.__class__(None, self._values)
+        return self._values.allocate(self.__class__)
 
     def copy_from(self, other):
         """Copy another value into this one."""
@@ -112,6 +135,8 @@ class Value(object):
 class Number(Value):
     """Abstract base class for numeric value."""
 
+    __slots__ = ('error_handler',)
+
     zero = None
     pos_max = None
     neg_max = None
@@ -144,6 +169,8 @@ class Number(Value):
 class Integer(Number):
     """16-bit signed little-endian integer."""
 
+    __slots__ = ()
+
     sigil = b'%'
     size = 2
 
@@ -196,15 +223,15 @@ class Integer(Number):
 
     def to_double(self):
         """Convert to double."""
-        return Double(None, self._values).from_integer(self)
+        return self._values.allocate(Double).from_integer(self)
 
     def to_single(self):
         """Convert to single."""
-        return Single(None, self._values).from_integer(self)
+        return self._values.allocate(Single).from_integer(self)
 
     def to_float(self, allow_double=True):
         """Convert to float."""
-        return Single(None, self._values).from_integer(self)
+        return self._values.allocate(Single).from_integer(self)
 
     to_value = to_int
     from_value = from_int
@@ -326,7 +353,7 @@ class Integer(Number):
         if (
                 (bytearray(self._buffer)[1] > 0x7f) ==
                 (bytearray(rhs._buffer)[1] > 0x7f) !=
-                (msb > 0x7f)
+                ((msb & 0xff) > 0x7f)
             ):
             raise error.BASICError(error.OVERFLOW)
         self._buffer[:] = bytearray([lsb, msb & 0xff])
@@ -408,6 +435,8 @@ class Integer(Number):
 class Float(Number):
     """Abstract base class for floating-point value."""
 
+    __slots__ = ()
+
     digits = None
     pos_max = None
     neg_max = None
@@ -418,17 +447,17 @@ class Float(Number):
 
     def is_zero(self):
         """Value is zero."""
-        return bytearray(self._buffer)[-1] == 0
+        return self._buffer[-1:] == b'\0'
 
     def is_negative(self):
         """Value is negative."""
-        return bytearray(self._buffer)[-2] >= 0x80
+        return self._buffer[-2:-1].tobytes() >= b'\x80'
 
     def sign(self):
         """Sign of value."""
-        if bytearray(self._buffer)[-1] == 0:
+        if self._buffer[-1:] == b'\0':
             return 0
-        elif (bytearray(self._buffer)[-2] & 0x80) != 0:
+        elif self._buffer[-2:-1].tobytes() >= b'\x80':
             return -1
         return 1
 
@@ -440,7 +469,7 @@ class Float(Number):
 
     def to_integer(self, unsigned=False):
         """Convert Float to Integer."""
-        return Integer(None, self._values).from_int(self.to_int(), unsigned)
+        return self._values.allocate(Integer).from_int(self.to_int(), unsigned)
 
     # Python float conversions
 
@@ -553,7 +582,7 @@ class Float(Number):
             return self.gt(self.new().from_integer(rhs))
         elif isinstance(rhs, Double) and isinstance(self, Single):
             # upgrade to Double
-            return Double(None, self._values).from_single(self).gt(rhs)
+            return self._values.allocate(Double).from_single(self).gt(rhs)
         rhsneg = rhs.is_negative()
         # treat zero separately to avoid comparing different mantissas
         # zero is only greater than negative
@@ -573,7 +602,7 @@ class Float(Number):
             return self.eq(self.new().from_integer(rhs))
         elif isinstance(rhs, Double) and isinstance(self, Single):
             # upgrade to Double
-            return Double(None, self._values).from_single(self).eq(rhs)
+            return self._values.allocate(Double).from_single(self).eq(rhs)
         # all zeroes are equal
         if self.is_zero():
             return rhs.is_zero()
@@ -660,18 +689,7 @@ class Float(Number):
 
     def to_decimal(self, digits):
         """Return value as mantissa of length min(digits, self.digits) and decimal exponent."""
-        if digits >= self.digits:
-            # we'd be better off storing these (and self._ten) in denormalised form
-            lim_bot = self.new().from_bytes(self._lim_bot)
-            lim_top = self.new().from_bytes(self._lim_top)
-        elif digits > 0:
-            lim_bot = self.new().from_int(10**(digits-1))._just_under()
-            lim_top = self.new().from_int(10**digits)._just_under()
-        else:
-            lim_bot = self.new().from_int(0)
-            lim_top = self.new().from_int(10**digits)._just_under()
-        tden = lim_top._denormalise()
-        bden = lim_bot._denormalise()
+        bden, tden = self._get_decimal_limits(min(digits, self.digits))
         exp10 = 0
         den = self._denormalise()
         while self._abs_gt_den(den, tden):
@@ -702,10 +720,11 @@ class Float(Number):
         """Set value to mantissa and decimal exponent."""
         den = self.from_int(mantissa)._denormalise()
         # apply decimal exponent
-        while (exp10 < 0):
+        # stop once the binary exponent is out of range, as further steps only take it further out
+        while (exp10 < 0) and den[0] > 0:
             den = self._div10_den(den)
             exp10 += 1
-        while (exp10 > 0):
+        while (exp10 > 0) and den[0] <= 255:
             den = self._mul10_den(den)
             exp10 -= 1
         return self._normalise(*den)
@@ -824,6 +843,27 @@ class Float(Number):
     _ten = None
     _lim_bot = None
     _lim_top = None
+    # cache of denormalised decimal limits by number of digits
+    _decimal_limits = None
+
+    def _get_decimal_limits(self, digits):
+        """Denormalised bounds for a decimal mantissa of the given number of digits."""
+        try:
+            return self._decimal_limits[digits]
+        except KeyError:
+            pass
+        if digits == self.digits:
+            lim_bot = self.new().from_bytes(self._lim_bot)
+            lim_top = self.new().from_bytes(self._lim_top)
+        elif digits > 0:
+            lim_bot = self.new().from_int(10**(digits-1))._just_under()
+            lim_top = self.new().from_int(10**digits)._just_under()
+        else:
+            lim_bot = self.new().from_int(0)
+            lim_top = self.new().from_int(10**digits)._just_under()
+        limits = lim_bot._denormalise(), lim_top._denormalise()
+        self._decimal_limits[digits] = limits
+        return limits
 
     def _apply_carry_den(self, den):
         """Round the carry byte (to be used only in to_decimal)."""
@@ -856,8 +896,22 @@ class Float(Number):
 
     def _div10_den(self, lden):
         """Divide by 10 in-place."""
-        exp, man, neg = self._div_den(lden,
-            self.new().from_bytes(self._ten)._denormalise())
+        exp, man, neg = lden
+        # this gives the same result as _div_den by the mantissa of ten, 0xa0 followed by zeroes:
+        # all but the last two quotient bits are taken against exact shifts of 5,
+        # leaving the largest quotient with a nonzero remainder
+        quotient = (man - 1) // 5
+        remainder = man - 5 * quotient
+        # the last two are taken against the truncated divisors 2 and 1
+        quotient <<= 1
+        if remainder > 2:
+            remainder -= 2
+            quotient += 1
+        quotient <<= 1
+        if remainder > 1:
+            quotient += 1
+        # ten is 5 * 2**3
+        exp, man = exp - 3, quotient
         # perhaps this should be in _div_den
         while man < self._den_mask:
             exp -= 1
@@ -868,7 +922,16 @@ class Float(Number):
         """Multiply in-place by 10."""
         exp, man, neg = den
         # 10x == 2(x+4x)
-        return self._add_den((exp+1, man, neg), (exp+3, man, neg))
+        # this is _add_den((exp+1, man, neg), (exp+3, man, neg)) with the exponents matched
+        man, sticky = man + (man >> 2), man & 0x3
+        exp += 3
+        if man >= self._den_upper:
+            exp += 1
+            man >>= 1
+        # break tie for rounding if we're at exact half after dropping digits
+        if sticky:
+            man |= 0x1
+        return exp, man, neg
 
 
     ##########################################################################
@@ -877,6 +940,7 @@ class Float(Number):
     _bias = None
     _shift = None
     _intformat = None
+    _exp_shift = None
     _mask = None
     _posmask = None
     _signmask = None
@@ -886,12 +950,11 @@ class Float(Number):
 
     def _denormalise(self):
         """Denormalise to shifted mantissa, exp, sign."""
-        exp = bytearray(self._buffer)[-1]
-        man = struct.unpack(
-                self._intformat, b'\0' + bytearray(self._buffer)[:-1]
-            )[0] | self._den_mask
-        neg = self.is_negative()
-        return exp, man, neg
+        # read the whole value as one int: exponent byte on top, then sign bit and mantissa
+        value, = struct.unpack_from(self._intformat, self._buffer)
+        # move the mantissa up to make room for the carry byte; replace sign by the assumed bit
+        man = ((value << 8) & (self._den_upper - 1)) | self._den_mask
+        return value >> self._exp_shift, man, (value & self._signmask) != 0
 
     def _normalise(self, exp, man, neg):
         """Normalise from shifted mantissa, exp, sign."""
@@ -900,9 +963,11 @@ class Float(Number):
             self._buffer[:] = b'\0' * self.size
             return self
         # shift left if subnormal
-        while man < (self._den_mask-1):
-            exp -= 1
-            man <<= 1
+        if man < (self._den_mask-1):
+            # the top bit ends up in the assumed-bit position
+            shift = self._exp_shift + 8 - man.bit_length()
+            exp -= shift
+            man <<= shift
         # round to nearest; halves to even (Gaussian rounding)
         round_up = (man & 0xff > 0x80) or (man & 0xff == 0x80 and man & 0x100 == 0x100)
         man = (man & self._carrymask) + 0x100 * round_up
@@ -910,11 +975,12 @@ class Float(Number):
             exp += 1
             man >>= 1
         # pack into byte representation
-        struct.pack_into(
-            self._intformat, self._buffer, 0, (man>>8) & (self._mask if neg else self._posmask)
-        )
-        if self._check_limits(exp, neg):
-            self._buffer[-1:] = int2byte(exp)
+        man = (man>>8) & (self._mask if neg else self._posmask)
+        if 0 < exp <= 255:
+            struct.pack_into(self._intformat, self._buffer, 0, man | (exp << self._exp_shift))
+        else:
+            struct.pack_into(self._intformat, self._buffer, 0, man)
+            self._check_limits(exp, neg)
         return self
 
     def _to_int_den(self):
@@ -946,6 +1012,16 @@ class Float(Number):
 
     def _bring_to_range(self, man, exp, lower, upper):
         """Bring mantissa to range (posmask, mask]."""
+        # first take the shifts that are certain to be needed in one go
+        shift = abs(man).bit_length() - upper.bit_length() - 1
+        if shift > 0:
+            exp += shift
+            man >>= shift
+        elif man:
+            shift = lower.bit_length() - abs(man).bit_length() - 1
+            if shift > 0:
+                exp -= shift
+                man <<= shift
         while abs(man) <= lower:
             exp -= 1
             man <<= 1
@@ -959,17 +1035,13 @@ class Float(Number):
         # don't compare zeroes - failsafe, is not reached in code
         if self.is_zero(): # pragma: no cover
             return False
-        rhscopy = bytearray(rhs._buffer)
+        left, = struct.unpack_from(self._intformat, self._buffer)
+        right, = struct.unpack_from(self._intformat, rhs._buffer)
         # so long as the sign is the same ...
-        rhscopy[-2] &= (bytearray(self._buffer)[-2] | 0x7f)
+        if not left & self._signmask:
+            right &= ~self._signmask
         # ... we can compare floats as if they were ints
-        for l, r in reversed(list(zip(bytearray(self._buffer), bytearray(rhscopy)))):
-            if l > r:
-                return True
-            elif l < r:
-                return False
-        # equal
-        return False
+        return left > right
 
     def _add_den(self, lden, rden):
         """Denormalised add."""
@@ -1036,9 +1108,25 @@ class Float(Number):
         # subtract exponentials
         lexp -= rexp - self._bias - 8
         # long division of mantissas
+        # the divisor is shifted right at each step, dropping its low bits
         work_man = lman
         lman = 0
         lexp += 1
+        # take eight quotient bits at once while the divisor is long enough:
+        # the steps subtract (rman >> i) for each quotient bit 2**(7-i) they set,
+        # which adds up to (rman >> 7) * byte + TRUNCATED_SUMS[(rman & 0x7f) << 8 | byte]
+        while rman >= 0x8000:
+            head, tail = rman >> 7, (rman & 0x7f) << 8
+            # at most one too large, as the tail sums are less than head
+            byte = min(0xff, (work_man - 1) // head)
+            subtract = head * byte + TRUNCATED_SUMS[tail | byte]
+            if subtract >= work_man:
+                byte -= 1
+                subtract = head * byte + TRUNCATED_SUMS[tail | byte]
+            work_man -= subtract
+            lman = (lman << 8) | byte
+            lexp -= 8
+            rman >>= 8
         while (rman > 0):
             lman <<= 1
             lexp -= 1
@@ -1055,6 +1143,8 @@ class Float(Number):
 class Single(Float):
     """Single-precision MBF float."""
 
+    __slots__ = ()
+
     sigil = b'!'
     size = 4
 
@@ -1065,6 +1155,7 @@ class Single(Float):
     neg_max = b'\xff\xff\xff\xff'
 
     _intformat = '<L'
+    _exp_shift = 24
 
     _bias = 128 + 24
     _shift = _bias - 129
@@ -1081,6 +1172,7 @@ class Single(Float):
     _ten = b'\x00\x00\x20\x84'
     _lim_top = b'\x7f\x96\x18\x98' # 9999999, highest float less than 10e+7
     _lim_bot = b'\xff\x23\x74\x94' # 999999.9, highest float  less than 10e+6
+    _decimal_limits = {}
 
     def to_token(self):
         """Return value as Single token."""
@@ -1099,7 +1191,7 @@ class Single(Float):
 
     def to_double(self):
         """Convert single to double."""
-        return Double(None, self._values).from_single(self)
+        return self._values.allocate(Double).from_single(self)
 
     def to_float(self, allow_double=True):
         """Convert single to float."""
@@ -1112,6 +1204,8 @@ class Single(Float):
 class Double(Float):
     """Double-precision MBF float."""
 
+    __slots__ = ()
+
     sigil = b'#'
     size = 8
 
@@ -1122,6 +1216,7 @@ class Double(Float):
     neg_max = b'\xff\xff\xff\xff\xff\xff\xff\xff'
 
     _intformat = '<Q'
+    _exp_shift = 56
 
     _bias = 128 + 56
     _shift = _bias - 129
@@ -1138,6 +1233,7 @@ class Double(Float):
     _ten = b'\x00\x00\x00\x00\x00\x00\x20\x84'
     _lim_top = b'\xff\xff\x03\xbf\xc9\x1b\x0e\xb6' # highest float less than 10e+16
     _lim_bot = b'\xff\xff\x9f\x31\xa9\x5f\x63\xb2' # highest float less than 10e+15
+    _decimal_limits = {}
 
     def from_single(self, in_single):
         """Convert Single to Double in-place."""
@@ -1159,7 +1255,7 @@ class Double(Float):
     def to_single(self):
         """Round double to single."""
         mybytes = self.to_bytes()
-        single = Single(None, self._values).from_bytes(mybytes[4:])
+        single = self._values.allocate(Single).from_bytes(mybytes[4:])
         exp, man, neg = single._denormalise()
         # carry byte
         man += mybytes[3]
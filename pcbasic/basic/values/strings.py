@@ -8,6 +8,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import struct
 import logging
+from bisect import bisect_left
 from operator import itemgetter
 
 from ...compat import iteritems
@@ -19,6 +20,8 @@ from . import numbers
 class String(numbers.Value):
     """String pointer."""
 
+    __slots__ = ('_stringspace',)
+
     sigil = b'$'
     size = 3
 
@@ -159,6 +162,9 @@ class StringSpace(object):
         """Initialise empty string space."""
         self._memory = memory
         self._strings = {}
+        # negated addresses of stored strings, in ascending order
+        # strings are stored downwards, so a new string is always appended
+        self._addresses = []
         self._temp = None
         self.clear()
 
@@ -169,6 +175,7 @@ class StringSpace(object):
     def clear(self):
         """Empty string space."""
         self._strings.clear()
+        del self._addresses[:]
         # strings are placed at the top of string memory, just below the stack
         self.current = self._memory.stack_start()
 
@@ -176,6 +183,7 @@ class StringSpace(object):
         """Rebuild from stored copy."""
         self.clear()
         self._strings.update(stringspace._strings)
+        self._addresses[:] = stringspace._addresses
         self.current = stringspace.current
 
     def copy_to(self, string_space, length, address):
@@ -232,6 +240,7 @@ class StringSpace(object):
             if length > 0:
                 # copy and convert to bytearray
                 self._strings[address] = bytearray(in_str)
+                self._addresses.append(-address)
         return length, address
 
     def _delete_last(self):
@@ -241,13 +250,14 @@ class StringSpace(object):
             length = len(self._strings[last_address])
             self.current += length
             del self._strings[last_address]
+            self._addresses.pop()
         except KeyError: # pragma: no cover
             # maybe happens if we're called before an out-of-memory exception is handled
             # and the string wasn't allocated
             pass
 
     def collect_garbage(self, string_ptrs):
-        """Re-store the strings referenced in string_ptrs, delete the rest."""
+        """Compact the strings referenced in string_ptrs, delete the rest; return bytes moved."""
         # string_ptrs should be a list of memoryviews to the original pointers
         # retrieve addresses and copy strings
         string_list = []
@@ -259,7 +269,7 @@ class StringSpace(object):
             # exclude empty elements of string arrays (len==0 and addr==0)
             # exclude strings is not located in memory (FIELD or code strings)
             if addr >= self._memory.var_start():
-                string_list.append((view, addr, self._retrieve(length, addr)))
+                string_list.append((view, addr, length, self._retrieve(length, addr)))
                 # set sentinel string (lowest-address permanent string)
                 # don't use zero-length strings as sentinel:
                 # they share an address with allocated strings and may get swapped on sorting
@@ -269,25 +279,44 @@ class StringSpace(object):
                         last_permanent, last_perm_view = addr, view
         # sort by address, largest first (maintain order of storage)
         string_list.sort(key=itemgetter(1), reverse=True)
-        # clear the string buffer and re-store all referenced strings
+        # pack the referenced strings at the top of string space in the same order
+        # strings are stored downwards from the top: strings above the highest gap stay in place,
+        # everything below it moves up
         self.clear()
-        for view, _, string in string_list:
-            # re-allocate string space
+        moved = 0
+        for view, addr, length, string in string_list:
+            new_length = len(string)
+            self.current -= new_length
+            new_addr = self.current + 1
+            # don't store empty strings
+            if new_length:
+                if new_addr == addr:
+                    self._strings[addr] = string
+                else:
+                    # copy, as the same string may be referenced more than once
+                    self._strings[new_addr] = bytearray(string)
+                    moved += new_length
+                self._addresses.append(-new_addr)
             # update the original pointers supplied (these are memoryviews)
-            view[:] = struct.pack('<BH', *self.store(string, check_free=False))
+            if (new_length, new_addr) != (length, addr):
+                view[:] = struct.pack('<BH', new_length, new_addr)
         # readdress  start of temporary strings
         if last_perm_view is None:
             self._temp = None
         elif self._temp is not None and self._temp != self._memory.stack_start():
             self._temp = -1 + struct.unpack_from('<H', last_perm_view.tobytes(), 1)[0]
+        return moved
 
     def get_memory(self, address):
         """Retrieve data from data memory: string space """
-        # find the variable we're in
-        for try_address, value in iteritems(self._strings):
-            length = len(value)
-            if try_address <= address < try_address + length:
-                return value[address - try_address]
+        # find the last string that starts at or before the address
+        index = bisect_left(self._addresses, -address)
+        if index == len(self._addresses):
+            return -1
+        try_address = -self._addresses[index]
+        value = self._strings[try_address]
+        if address < try_address + len(value):
+            return value[address - try_address]
         return -1
 
     def fix_temporaries(self):
@@ -47,6 +47,12 @@ TYPE_TO_CLASS = {
     DBL: numbers.Double
 }
 
+# null representations, by size
+ZERO_BYTES = {_size: b'\0' * _size for _size in SIZE_TO_CLASS}
+
+# number of recycled temporaries kept per numeric type
+FREE_LIST_SIZE = 16
+
 # cutoff for trigonometric functions
 # above this machine precision makes the result useless and machine/os dependent
 # this is close to what gw uses but not quite equivalent
@@ -203,6 +209,8 @@ class Values(object):
         # double-precision EXP, SIN, COS, TAN, ATN, LOG
         self.double_math = double_math
         self.error_handler = None
+        # recycled temporary numbers, by class
+        self._free = {numbers.Integer: [], numbers.Single: [], numbers.Double: []}
 
     def set_handler(self, handler):
         """Initialise the error message console."""
@@ -213,9 +221,24 @@ class Values(object):
         # this sets a view, not a copy
         return SIZE_TO_CLASS[len(buf)](buf, self)
 
+    def allocate(self, cls):
+        """Return a value of the given class with zeroed buffer, recycled if possible."""
+        free = self._free.get(cls)
+        if free:
+            value = free.pop()
+            value._buffer[:] = ZERO_BYTES[cls.size]
+            return value
+        return cls(None, self)
+
+    def release(self, value):
+        """Return a temporary value to the free list; it must not be referenced elsewhere."""
+        free = self._free.get(value.__class__)
+        if free is not None and len(free) < FREE_LIST_SIZE:
+            free.append(value)
+
     def new(self, sigil):
         """Return newly allocated value of the given type with zeroed buffer."""
-        return TYPE_TO_CLASS[sigil](None, self)
+        return self.allocate(TYPE_TO_CLASS[sigil])
 
     def new_string(self):
         """Return newly allocated null string."""
@@ -223,15 +246,15 @@ class Values(object):
 
     def new_integer(self):
         """Return newly allocated zero integer."""
-        return numbers.Integer(None, self)
+        return self.allocate(numbers.Integer)
 
     def new_single(self):
         """Return newly allocated zero single."""
-        return numbers.Single(None, self)
+        return self.allocate(numbers.Single)
 
     def new_double(self):
         """Return newly allocated zero double."""
-        return numbers.Double(None, self)
+        return self.allocate(numbers.Double)
 
     ###########################################################################
     # convert between BASIC and Python values
@@ -249,8 +272,8 @@ class Values(object):
     def from_bool(self, boo):
         """Convert Python boolean to Integer."""
         if boo:
-            return numbers.Integer(None, self).from_bytes(b'\xff\xff')
-        return numbers.Integer(None, self)
+            return self.allocate(numbers.Integer).from_bytes(b'\xff\xff')
+        return self.allocate(numbers.Integer)
 
     ###########################################################################
     # convert to and from internal representation
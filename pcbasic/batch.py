@@ -0,0 +1,250 @@
+"""
+PC-BASIC - batch.py
+Headless batch runs of many programs across a pool of worker processes
+
+(c) 2013--2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import os
+import time
+import shlex
+import tempfile
+import logging
+import multiprocessing
+import multiprocessing.util
+
+from .basic import api
+from .basic import implementation
+from .basic.base import error
+from .compat import nullcontext
+
+
+# program statuses in the summary
+OK = u'ok'
+EXIT = u'exit'
+BREAK = u'break'
+ERROR = u'error'
+TIMEOUT = u'timeout'
+STATEMENT_LIMIT = u'statement-limit'
+CRASH = u'crash'
+
+# file name extensions for directory batches
+PROGRAM_EXT = u'.BAS'
+INPUT_EXT = u'.IN'
+OUTPUT_EXT = u'.OUT'
+
+
+class LimitExceeded(BaseException):
+    """A program has exceeded its time or statement limit."""
+    # inherit from BaseException so that nothing on the way up catches this
+
+    def __init__(self, status):
+        """Initialise with the status to report."""
+        BaseException.__init__(self, status)
+        self.status = status
+
+
+class BatchImplementation(implementation.Implementation):
+    """Interpreter session that records why a program stopped."""
+
+    def __init__(self, **kwargs):
+        """Initialise the interpreter session."""
+        implementation.Implementation.__init__(self, **kwargs)
+        self.last_error = None
+
+    def _handle_error(self, e):
+        """Record an unhandled error or break before reporting it."""
+        self.last_error = e
+        implementation.Implementation._handle_error(self, e)
+
+
+class BatchSession(api.Session):
+    """Session that runs programs to completion, within limits."""
+
+    def __init__(self, *args, **kwargs):
+        """Set up session object."""
+        api.Session.__init__(self, *args, **kwargs)
+        self._statements = 0
+        self._statement_limit = 0
+        self._deadline = None
+
+    def start(self):
+        """Start the session."""
+        if not self._impl:
+            self._impl = BatchImplementation(**self._kwargs)
+            self._impl.attach_interface(self.interface)
+            # count statements and check limits between statements and while waiting
+            self._parse_statement = self._impl.parser.parse_statement
+            self._impl.parser.parse_statement = self._limited_statement
+            self._wait = self._impl.queues.wait
+            self._impl.queues.wait = self._limited_wait
+
+    def _limited_statement(self, ins):
+        """Parse a statement, unless a limit has been exceeded."""
+        # don't count the direct-mode RUN statement
+        if self._impl.interpreter.run_mode:
+            self._statements += 1
+        if self._statement_limit and self._statements > self._statement_limit:
+            raise LimitExceeded(STATEMENT_LIMIT)
+        if self._deadline and time.time() > self._deadline:
+            raise LimitExceeded(TIMEOUT)
+        self._parse_statement(ins)
+
+    def _limited_wait(self):
+        """Wait for events, unless the time limit has been exceeded."""
+        if self._deadline and time.time() > self._deadline:
+            raise LimitExceeded(TIMEOUT)
+        self._wait()
+
+    def run_program(self, program, input_file=None, output_file=None, time_limit=0, statement_limit=0):
+        """Run a program file with redirected input and output; return a result dict."""
+        self.start()
+        result = {
+            u'program': program,
+            u'input': input_file,
+            u'output': output_file,
+            u'status': OK,
+            u'error': None,
+            u'line': None,
+        }
+        # without redirected input, programs that wait for input exit
+        # use an empty file rather than the null device, which can't be polled
+        with (open(input_file, 'rb') if input_file else tempfile.TemporaryFile()) as instream:
+            with (open(output_file, 'wb') if output_file else nullcontext()) as outstream:
+                self._impl.redirect_streams(instream, outstream)
+                self._impl.last_error = None
+                self._statements = 0
+                self._statement_limit = statement_limit
+                start = time.time()
+                self._deadline = start + time_limit if time_limit else None
+                try:
+                    with self.bind_file(program) as progfile:
+                        self.execute(b'RUN "%s"' % (progfile,))
+                except error.Exit:
+                    # SYSTEM or end of input
+                    result[u'status'] = EXIT
+                except LimitExceeded as e:
+                    result[u'status'] = e.status
+                except Exception as e:
+                    logging.error(u'Crash in %s: %s', program, e)
+                    result[u'status'] = CRASH
+                    result[u'error'] = repr(e)
+                result[u'runtime'] = time.time() - start
+                # the statement that hit the limit has not been executed
+                result[u'statements'] = min(self._statements, statement_limit or self._statements)
+                self._deadline = None
+                # close files the program left open, so that their data is written
+                # and the next program doesn't inherit them
+                self._impl.files.close_all()
+                self._impl.io_streams.flush()
+                self._impl.redirect_streams(None, None)
+        last_error = self._impl.last_error
+        if result[u'status'] == OK and last_error:
+            result[u'status'] = BREAK if isinstance(last_error, error.Break) else ERROR
+            result[u'error'] = last_error.err or None
+            line = self._impl.program.get_line_number(last_error.pos)
+            result[u'line'] = line if 0 <= line <= 65535 else None
+        # return to direct mode for the next program
+        self._impl.interpreter.input_mode = False
+        self._impl.interpreter.set_pointer(False, 0)
+        self._impl.interpreter.set_parse_mode(False)
+        return result
+
+
+###############################################################################
+# job lists
+
+def find_jobs(source):
+    """List programs and their input and output files from a directory or manifest."""
+    if os.path.isdir(source):
+        return _scan_directory(source)
+    return _read_manifest(source)
+
+def _scan_directory(path):
+    """Find programs in a directory, with their input and output files by extension."""
+    jobs = []
+    names = sorted(os.listdir(path))
+    upper_names = {_name.upper(): _name for _name in names}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.upper() != PROGRAM_EXT:
+            continue
+        input_name = upper_names.get(stem.upper() + INPUT_EXT)
+        jobs.append((
+            os.path.join(path, name),
+            os.path.join(path, input_name) if input_name else None,
+            os.path.join(path, stem + OUTPUT_EXT),
+        ))
+    return jobs
+
+def _read_manifest(manifest):
+    """
+    Read programs from a manifest file.
+    Each line holds a program name, optionally followed by input and output file names;
+    use - for no redirection. Names are relative to the manifest's location.
+    """
+    jobs = []
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, 'r') as f:
+        for line in f:
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) > 3:
+                logging.warning(u'Ignored extra fields in manifest line: %s', line.strip())
+            fields = [
+                os.path.join(base, _name) if _name != u'-' else None
+                for _name in (fields + [u'-', u'-'])[:3]
+            ]
+            jobs.append(tuple(fields))
+    return jobs
+
+
+###############################################################################
+# worker pool
+
+# each worker process keeps one warmed-up session
+_worker_session = None
+
+def _init_worker(session_params):
+    """Start the session for this worker."""
+    global _worker_session
+    _worker_session = BatchSession(**session_params)
+    _worker_session.start()
+    # pool workers exit without running atexit handlers
+    multiprocessing.util.Finalize(None, _worker_session.close, exitpriority=10)
+
+def _run_job(args):
+    """Run a program in this worker's session."""
+    (program, input_file, output_file), time_limit, statement_limit = args
+    return _worker_session.run_program(
+        program, input_file, output_file, time_limit, statement_limit
+    )
+
+def run_batch(source, session_params, workers=0, time_limit=0, statement_limit=0):
+    """Run all programs from a directory or manifest; return summary dict."""
+    jobs = find_jobs(source)
+    # streams are set per program
+    session_params = dict(session_params, input_streams=None, output_streams=None)
+    # fail on configuration errors here; the pool would keep replacing workers that fail to start
+    with BatchSession(**session_params) as session:
+        session.start()
+    start = time.time()
+    pool = multiprocessing.Pool(workers or None, _init_worker, (session_params,))
+    try:
+        results = list(pool.imap(
+            _run_job, [(_job, time_limit, statement_limit) for _job in jobs], chunksize=1
+        ))
+    finally:
+        pool.close()
+        pool.join()
+    return {
+        u'programs': len(results),
+        u'statuses': {
+            _status: sum(1 for _result in results if _result[u'status'] == _status)
+            for _status in set(_result[u'status'] for _result in results)
+        },
+        u'runtime': time.time() - start,
+        u'results': results,
+    }
@@ -279,11 +279,16 @@ ARGUMENTS = {
     u'load': {u'type': u'string', u'default': u'', },
     u'run': {u'type': u'string', u'default': u'',  },
     u'convert': {u'type': u'string', u'default': u'', },
+    u'batch': {u'type': u'string', u'default': u'', },
+    u'batch-workers': {u'type': u'int', u'default': 0, },
+    u'batch-time-limit': {u'type': u'int', u'default': 0, },
+    u'batch-statement-limit': {u'type': u'int', u'default': 0, },
     u'help': {u'type': u'bool', u'default': False, },
     u'keys': {u'type': u'string', u'default': u'', },
     u'exec': {u'type': u'string', u'default': u'', },
     u'quit': {u'type': u'bool', u'default': False,},
     u'double': {u'type': u'bool', u'default': False,},
+    u'fast-math': {u'type': u'bool', u'default': False,},
     u'max-files': {u'type': u'int', u'default': 3,},
     u'max-reclen': {u'type': u'int', u'default': 128,},
     u'serial-buffer-size': {u'type': u'int', u'default': 256,},
@@ -303,6 +308,9 @@ ARGUMENTS = {
     u'fullscreen': {u'type': u'bool', u'default': False,},
     u'prevent-close': {u'type': u'bool', u'default': False,},
     u'debug': {u'type': u'bool', u'default': False,},
+    u'profile': {u'type': u'string', u'default': u'',},
+    u'program-cache': {u'type': u'string', u'default': u'',},
+    u'program-cache-size': {u'type': u'int', u'default': 16384,},
     u'hide-listing': {u'type': u'int', u'default': 65535,},
     u'hide-protected': {u'type': u'bool', u'default': False,},
     u'mount': {u'type': u'string', u'list': u'*', u'default': [],},
@@ -340,6 +348,7 @@ ARGUMENTS = {
     # negative list length means 'optionally up to'
     u'max-memory': {u'type': u'int', u'list': -2, u'default': [MAX_MEMORY_SIZE, 4096], u'listcheck': _check_max_memory},
     u'allow-code-poke': {u'type': u'bool', u'default': False,},
+    u'event-poll-interval': {u'type': u'int', u'list': -2, u'default': [1, 0],},
     u'reserved-memory': {u'type': u'int', u'default': 3429,},
     u'caption': {u'type': u'string', u'default': NAME,},
     u'text-width': {u'type': u'int', u'choices':(u'40', u'80'), u'default': 80,},
@@ -574,6 +583,7 @@ class Settings(object):
             'term': self.get('term'),
             'shell': self.get('shell'),
             'double': self.get('double'),
+            'fast_math': self.get('fast-math'),
             # device settings
             'devices': device_params,
             'current_device': current_device,
@@ -601,6 +611,13 @@ class Settings(object):
             # ignore key buffer in console-based interfaces, to allow pasting text in console
             'check_keybuffer_full': self.get('interface') not in ('cli', 'text', 'ansi', 'curses'),
             'enabled_writes': self._get_enabled_writes(),
+            # check for events every n statements or t milliseconds
+            'event_poll_interval': self.get('event-poll-interval'),
+            # execution profiler
+            'profile': self.get('profile', get_default=False) is not None,
+            # persistent cache of tokenised plain-text programs
+            'program_cache': self.get('program-cache'),
+            'program_cache_size': self.get('program-cache-size'),
         })
         # deprecated arguments
         if self.get('utf8', get_default=False) is not None:
@@ -887,6 +904,7 @@ class Settings(object):
             # this preserves unicode as \x (if latin-1) and \u escapes
             'keys': self.get('keys').encode('ascii', 'backslashreplace').decode('unicode-escape'),
             'debug': self.get('debug'),
+            'profile_file': self.get('profile', get_default=False),
             }
         launch_params.update(self.session_params)
         return launch_params
@@ -922,6 +940,16 @@ class Settings(object):
         name_out = self.get(1)
         return mode, name_in, name_out
 
+    @property
+    def batch_params(self):
+        """Get parameters for batch runs."""
+        return {
+            'source': self.get('batch'),
+            'workers': self.get('batch-workers'),
+            'time_limit': self.get('batch-time-limit'),
+            'statement_limit': self.get('batch-statement-limit'),
+        }
+
     @property
     def version(self):
         """Version operating mode."""
@@ -932,6 +960,11 @@ class Settings(object):
         """Help operating mode."""
         return self.get('help')
 
+    @property
+    def batch(self):
+        """Batch operating mode."""
+        return bool(self.get('batch'))
+
     @property
     def convert(self):
         """Converter operating mode."""
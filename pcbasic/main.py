@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import io
 import os
+import json
 import sys
 import locale
 import logging
@@ -15,6 +16,7 @@ import traceback
 from . import basic
 from . import state
 from . import config
+from . import batch
 from .guard import ExceptionGuard
 from .basic import NAME, VERSION, LONG_VERSION, COPYRIGHT
 from .basic import debug
@@ -34,6 +36,9 @@ def main(*arguments):
         elif settings.help:
             # print usage and exit
             _show_usage()
+        elif settings.batch:
+            # run programs in batch and exit
+            _run_batch(settings)
         elif settings.convert:
             # convert and exit
             _convert(settings)
@@ -72,6 +77,11 @@ def _convert(settings):
             mode_suffix = b',%s' % (mode.encode('ascii'),) if mode.upper() in ('A', 'P') else b''
             session.execute(b'SAVE "%s"%s' % (outfile, mode_suffix))
 
+def _run_batch(settings):
+    """Run programs headless across worker processes and write a summary."""
+    summary = batch.run_batch(session_params=settings.session_params, **settings.batch_params)
+    stdio.stdout.write(u'%s\n' % (json.dumps(summary, indent=2),))
+
 def _launch_session(settings):
     """Start an interactive interpreter session."""
     exception_guard = ExceptionGuard(**settings.guard_params)
@@ -83,7 +93,7 @@ def _launch_session(settings):
 def _run_session(
         interface=None, exception_guard=None,
         resume=False, debug=False, state_file=None,
-        prog=None, commands=(), keys=u'', greeting=True, **session_params
+        prog=None, commands=(), keys=u'', greeting=True, profile_file=None, **session_params
     ):
     """Run an interactive BASIC session."""
     Session = basic.DebugSession if debug else basic.Session
@@ -93,13 +103,32 @@ def _run_session(
                 protect = nullcontext()
             else:
                 protect = exception_guard.protect(interface, session)
-            with protect:
-                if greeting:
-                    session.greet()
-                if prog:
-                    with session.bind_file(prog) as progfile:
-                        session.execute(b'LOAD "%s"' % (progfile,))
-                session.press_keys(keys)
-                for cmd in commands:
-                    session.execute(cmd)
-                session.interact()
+            try:
+                with protect:
+                    if greeting:
+                        session.greet()
+                    if prog:
+                        with session.bind_file(prog) as progfile:
+                            session.execute(b'LOAD "%s"' % (progfile,))
+                    session.press_keys(keys)
+                    for cmd in commands:
+                        session.execute(cmd)
+                    session.interact()
+            finally:
+                # SYSTEM ends the session by raising Exit; if resuming, the session in use
+                # is not the one we started and holds the profile
+                if profile_file is not None:
+                    _write_profile(session, profile_file)
+
+def _write_profile(session, name):
+    """Write the execution profile report to stderr or report, JSON and collapsed-stack files."""
+    if session.get_profile() is None:
+        # a resumed session keeps the settings it was saved with
+        logging.warning(u'Resumed session was not profiled; no profile written.')
+        return
+    if not name:
+        stdio.stderr.write(session.get_profile('report'))
+        return
+    for ext, as_type in ((u'.txt', 'report'), (u'.json', 'json'), (u'.folded', 'collapsed')):
+        with io.open(name + ext, 'w', encoding='utf-8') as f:
+            f.write(session.get_profile(as_type))
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+PC-BASIC benchmarks
+Timings of interpreter internals
+
+(c) 2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import timeit
+
+# make pcbasic package accessible
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path = [os.path.join(HERE, '..')] + sys.path
+
+import pcbasic
+
+
+# number of repeats for each timing; the best is reported
+REPEAT = 3
+
+
+def _time(func, number):
+    """Best time per call, in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number * 1e6
+
+def _program(lines, statement=b'A=A+1'):
+    """Build a program of the given number of lines."""
+    return b'\n'.join(b'%d %s' % (10 * (_i + 1), statement) for _i in range(lines))
+
+
+def bench_line_number():
+    """Program.get_line_number lookup time by program size."""
+    for size in (100, 1000, 4000):
+        with pcbasic.Session(input_streams=None, output_streams=None) as s:
+            s.execute(_program(size))
+            program = s._impl.program
+            positions = [random.randrange(program.size()) for _ in range(1000)]
+            # first lookup after an edit builds the index
+            program.get_line_number(0)
+            def lookup():
+                for pos in positions:
+                    program.get_line_number(pos)
+            yield '%5d lines' % (size,), _time(lookup, 10) / len(positions)
+
+
+def bench_load_ascii():
+    """LOAD time for a plain-text program by program size."""
+    path = tempfile.mkdtemp()
+    try:
+        for size in (1000, 5000):
+            with open(os.path.join(path, 'PROG.BAS'), 'wb') as f:
+                f.write(_program(size).replace(b'\n', b'\r\n'))
+            with pcbasic.Session(
+                    input_streams=None, output_streams=None,
+                    devices={b'A': {'path': path}}, current_device=b'A'
+                ) as s:
+                yield '%5d lines' % (size,), _time(lambda: s.execute(b'LOAD "PROG"'), 1)
+    finally:
+        shutil.rmtree(path)
+
+
+def bench_float_arithmetic():
+    """Single and Double arithmetic and comparison time per operation."""
+    values = pcbasic.basic.values.Values(None, False)
+    for new in (values.new_single, values.new_double):
+        operands = [
+            (new().from_value(random.uniform(-1e6, 1e6)), new().from_value(random.uniform(-1e6, 1e6)))
+            for _ in range(100)
+        ]
+        for name in ('iadd', 'isub', 'imul', 'gt'):
+            def operate():
+                for left, right in operands:
+                    getattr(left.clone() if name != 'gt' else left, name)(right)
+            yield '%-6s %s' % (new().sigil.decode('ascii'), name), _time(operate, 100) / len(operands)
+
+def bench_float_division():
+    """Single and Double division time per operation."""
+    values = pcbasic.basic.values.Values(None, False)
+    for new in (values.new_single, values.new_double):
+        operands = [
+            (new().from_value(random.uniform(-1e6, 1e6)), new().from_value(random.uniform(-1e6, 1e6)))
+            for _ in range(100)
+        ]
+        def divide():
+            for left, right in operands:
+                left.clone().idiv(right)
+        yield '%-6s idiv' % (new().sigil.decode('ascii'),), _time(divide, 100) / len(operands)
+
+def bench_decimal():
+    """Conversion time between Single and Double values and decimal mantissa and exponent."""
+    values = pcbasic.basic.values.Values(None, False)
+    for new in (values.new_single, values.new_double):
+        numbers = [new().from_value(10**random.uniform(-38, 38)) for _ in range(100)]
+        decimals = [_number.to_decimal(_number.digits) for _number in numbers]
+        def to_decimal():
+            for number in numbers:
+                number.to_decimal(number.digits)
+        def from_decimal():
+            for mantissa, exp10 in decimals:
+                new().from_decimal(mantissa, exp10)
+        sigil = new().sigil.decode('ascii')
+        yield '%-6s to_decimal' % (sigil,), _time(to_decimal, 20) / len(numbers)
+        yield '%-6s from_decimal' % (sigil,), _time(from_decimal, 20) / len(numbers)
+
+def bench_tokenise():
+    """Tokeniser time per line and throughput in lines per second."""
+    values = pcbasic.basic.values.Values(None, False)
+    keywords = pcbasic.basic.base.tokens.TokenKeywordDict('advanced')
+    tokeniser = pcbasic.basic.converter.tokeniser.Tokeniser(values, keywords)
+    for label, statement in (
+            ('short', b'A=A+1'),
+            ('keywords', b'IF INKEY$="" THEN PRINT CHR$(65);SPC(2);MID$(A$,2) ELSE GOSUB 100'),
+            ('names', b'LONGNAME.ONE=TOTAL.COUNT*RESULTINGVALUE+OTHERNAME(INDEX,NEXTINDEX)'),
+        ):
+        lines = _program(1000, statement).split(b'\n')
+        def tokenise():
+            for line in lines:
+                tokeniser.tokenise_line(line)
+        usecs = _time(tokenise, 10) / len(lines)
+        yield '%-9s %8d lines/s' % (label, 1e6 / usecs), usecs
+
+def bench_renum():
+    """RENUM time by program size, with two jumps on each line."""
+    for size in (250, 1000):
+        with pcbasic.Session(input_streams=None, output_streams=None) as s:
+            s.execute(b'\n'.join(
+                b'%d IF A THEN %d ELSE GOSUB 10: PRINT "GOTO 10";A$' % (10 * (_i + 1), 10 * (_i + 2))
+                for _i in range(size)
+            ))
+            yield '%5d lines' % (size,), _time(lambda: s.execute(b'RENUM'), 1)
+
+def bench_statements():
+    """Interpreter time per statement and throughput in statements per second."""
+    for label, program, count in (
+            ('loop', b'10 FOR I=1 TO 2000: A=A+1: NEXT', 4000),
+            ('branch', b'10 FOR I=1 TO 1000: IF I MOD 2 THEN A=A+1 ELSE B=B+1\n20 NEXT', 3000),
+            ('gosub', b'10 FOR I=1 TO 1000: GOSUB 30: NEXT: END\n30 A$=CHR$(65+I MOD 26): RETURN', 5000),
+            ('literal', b'10 FOR I=1 TO 2000: X=X*1.0001+0.5: NEXT', 4000),
+            ('scalars', b'10 DEFINT J-K: FOR I=1 TO 1000: J=K: K=J+1: X$=Y$: Y$=X$: NEXT', 5000),
+            ('for', b'10 FOR I=1 TO 5000: NEXT', 5000),
+            ('intfor', b'10 FOR I%=1 TO 5000: NEXT', 5000),
+        ):
+        # check events rarely, to time the interpreter rather than the event cycle
+        with pcbasic.Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000, 50)
+            ) as s:
+            s.execute(program)
+            usecs = _time(lambda: s.execute(b'RUN'), 1) / count
+            yield '%-7s %8d statements/s' % (label, 1e6 / usecs), usecs
+
+def bench_allocations():
+    """Value objects created per statement and peak traced memory, by tracemalloc."""
+    import tracemalloc
+    from pcbasic.basic.values import numbers
+    init = numbers.Value.__init__
+    created = [0]
+    def _counting_init(self, buffer, values):
+        created[0] += 1
+        init(self, buffer, values)
+    for label, program, count in (
+            ('sum', b'10 FOR I=1 TO 1000: X=X+I*2-1: NEXT', 2000),
+            ('poly', b'10 FOR I=1 TO 500: Y=((3*I+2)*I-5)*I+7: NEXT', 1000),
+            ('compare', b'10 FOR I=1 TO 1000: A=(I>5 AND I<900) OR -I=3: NEXT', 2000),
+        ):
+        with pcbasic.Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000, 50)
+            ) as s:
+            s.execute(program)
+            # compile expressions on a first run
+            s.execute(b'RUN')
+            numbers.Value.__init__ = _counting_init
+            created[0] = 0
+            tracemalloc.start()
+            try:
+                start = timeit.default_timer()
+                s.execute(b'RUN')
+                usecs = (timeit.default_timer() - start) / count * 1e6
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                numbers.Value.__init__ = init
+            yield '%-7s %5.2f values/statement %7d bytes peak' % (
+                label, created[0] / float(count), peak
+            ), usecs
+
+def bench_fast_math():
+    """Arithmetic statement time with MBF and with native fast math."""
+    for label, program, count in (
+            ('sum', b'10 FOR I=1 TO 1000: X=X+I*2-1: NEXT', 2000),
+            ('poly', b'10 FOR I=1 TO 500: Y=((3*I+2)*I-5)*I+7: NEXT', 1000),
+            ('double', b'10 FOR I=1 TO 500: Z#=(Z#*1.0001#+I/3)/(1+I*I): NEXT', 1000),
+        ):
+        for fast_math in (False, True):
+            with pcbasic.Session(
+                    input_streams=None, output_streams=None, event_poll_interval=(1000, 50),
+                    fast_math=fast_math
+                ) as s:
+                s.execute(program)
+                usecs = _time(lambda: s.execute(b'RUN'), 1) / count
+                yield '%-7s %-5s %8d statements/s' % (
+                    label, 'fast' if fast_math else 'mbf', 1e6 / usecs
+                ), usecs
+
+
+def bench_garbage():
+    """String space garbage collection in programs with large string arrays."""
+    for label, program in (
+            ('sparse', b'10 DIM A$(5000): FOR I=1 TO 500: A$(I*2)=STR$(I)+"x": X=FRE(""): NEXT'),
+            ('churn', b'10 DIM A$(500): FOR I=1 TO 2000: A$(I MOD 500)=STRING$(100, 65): NEXT'),
+        ):
+        with pcbasic.Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000, 50)
+            ) as s:
+            s.execute(program)
+            usecs = _time(lambda: s.execute(b'RUN'), 1)
+            # counters accumulate over all timed runs
+            stats = s.get_garbage_stats()
+            yield '%-7s %6d collections %9d bytes moved per run' % (
+                label, stats['collections'] // REPEAT, stats['bytes_moved'] // REPEAT
+            ), usecs
+
+def bench_peek():
+    """PEEK time per byte into scalar, array and string memory."""
+    scalars = b'\n'.join(b'%d V%d=%d' % (_i + 1, _i, _i) for _i in range(500))
+    arrays = b'\n'.join(b'%d DIM X%d(10)' % (_i + 1, _i) for _i in range(200))
+    strings = b'1 DIM A$(2000): FOR I=0 TO 2000: A$(I)=STR$(I): NEXT'
+    for label, program, start in (
+            ('scalars', scalars, b'VARPTR(V0)'),
+            ('arrays', arrays, b'VARPTR(X0(0))'),
+            ('strings', strings, b'PEEK(VARPTR(A$(0))+1)+256*PEEK(VARPTR(A$(0))+2)-4000'),
+        ):
+        with pcbasic.Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000, 50),
+                peek_values={}
+            ) as s:
+            s.execute(program + b'\n8999 END\n9000 P=%s: FOR I=P TO P+2000: X=PEEK(I): NEXT' % (start,))
+            # set up variables once, then time only the PEEK loop
+            s.execute(b'RUN')
+            yield label, _time(lambda: s.execute(b'GOTO 9000'), 1) / 2001
+
+def bench_arrays():
+    """Transfer of a 10000-element array between Python and BASIC."""
+    values = [0.5 * _i for _i in range(10000)]
+    with pcbasic.Session(input_streams=None, output_streams=None) as s:
+        s.execute(b'DIM A!(9999)')
+        yield 'get_variable', _time(lambda: s.get_variable(b'A!()'), 1)
+        yield 'get_array', _time(lambda: s.get_array(b'A!'), 1)
+        yield 'set_variable', _time(lambda: s.set_variable(b'A!()', values), 1)
+        yield 'set_array', _time(lambda: s.set_array(b'A!', values), 1)
+
+
+BENCHMARKS = {
+    'allocations': bench_allocations,
+    'line_number': bench_line_number,
+    'load_ascii': bench_load_ascii,
+    'renum': bench_renum,
+    'statements': bench_statements,
+    'float_arithmetic': bench_float_arithmetic,
+    'float_division': bench_float_division,
+    'peek': bench_peek,
+    'arrays': bench_arrays,
+    'decimal': bench_decimal,
+    'garbage': bench_garbage,
+    'fast_math': bench_fast_math,
+    'tokenise': bench_tokenise,
+}
+
+
+def run_benchmarks(names):
+    """Run the selected benchmarks and report timings."""
+    for name in names:
+        print('%s: %s' % (name, BENCHMARKS[name].__doc__))
+        for label, usecs in BENCHMARKS[name]():
+            print('    %-30s %10.3f us' % (label, usecs))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    unknown = [_name for _name in args if _name not in BENCHMARKS]
+    if unknown:
+        print('Unknown benchmark: %s. Available: %s.' % (
+            ', '.join(unknown), ', '.join(sorted(BENCHMARKS))
+        ))
+        sys.exit(1)
+    run_benchmarks(args or sorted(BENCHMARKS))
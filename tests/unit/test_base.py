@@ -185,6 +185,44 @@ class TokenisedStreamTest(unittest.TestCase):
         assert cs.tell() == 7
 
 
+    def test_file_interface(self):
+        """Test read, write, seek, tell and truncate."""
+        cs = TokenisedStream()
+        assert cs.write(b'abc') == 3
+        assert cs.tell() == 3
+        assert cs.read(1) == b''
+        cs.seek(1)
+        cs.write(b'XYZ')
+        assert cs.getvalue() == b'aXYZ'
+        assert cs.seek(-2, 1) == 2
+        assert cs.read(5) == b'YZ'
+        assert cs.seek(-10, 2) == 0
+        with self.assertRaises(ValueError):
+            cs.seek(-1)
+        cs.seek(6)
+        cs.write(b'!')
+        assert cs.getvalue() == b'aXYZ\0\0!'
+        cs.seek(2)
+        cs.truncate()
+        assert cs.tell() == 2
+        assert cs.read() == b''
+        assert cs.getvalue() == b'aX'
+
+    def test_skip_to(self):
+        """Test skip_to skips string literals, comments and number tokens."""
+        cs = TokenisedStream()
+        cs.write(b'A="a:b":\x0e\x3a\x00 B\x8f x:y\x00\x01\x02\x03\x04:')
+        cs.seek(0)
+        cs.skip_to((b'\0', b'', b':'))
+        assert cs.tell() == 7
+        cs.read(1)
+        cs.skip_to((b':',))
+        assert cs.tell() == 23
+        cs.seek(7)
+        cs.skip_to((b':',), break_on_first_char=False)
+        assert cs.tell() == 23
+
+
 class ByteMatrixTest(unittest.TestCase):
     """Unit tests for bytematrix."""
 
@@ -0,0 +1,104 @@
+"""
+PC-BASIC test.batch
+Tests for headless batch runs
+
+(c) 2022 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import io
+import json
+
+from pcbasic import run
+from pcbasic import batch
+from pcbasic.compat import stdio
+from tests.unit.utils import TestCase, run_tests
+
+
+class BatchTest(TestCase):
+    """Unit tests for batch runs."""
+
+    tag = u'batch'
+
+    def _write(self, name, contents):
+        """Write a file to the output directory."""
+        with open(self.output_path(name), 'wb') as f:
+            f.write(contents)
+        return self.output_path(name)
+
+    def test_statuses(self):
+        """Programs are reported with their exit status and the session is reused."""
+        self._write('END.BAS', b'10 FOR I=1 TO 3: PRINT I;: NEXT\r\n')
+        self._write('ERROR.BAS', b'10 PRINT "x"\r\n20 X=SQR(-1)\r\n')
+        self._write('SYSTEM.BAS', b'10 SYSTEM\r\n')
+        self._write('INPUT.BAS', b'10 INPUT A$: PRINT "got ";A$\r\n20 INPUT B$\r\n')
+        self._write('LOOP.BAS', b'10 GOTO 10\r\n')
+        with batch.BatchSession(input_streams=None, output_streams=None) as s:
+            results = [
+                s.run_program(self.output_path(_name), None, self.output_path(_name + '.OUT'), 0, 100)
+                for _name in ('LOOP.BAS', 'END.BAS', 'ERROR.BAS', 'SYSTEM.BAS', 'INPUT.BAS')
+            ]
+        assert [_r['status'] for _r in results] == [
+            batch.STATEMENT_LIMIT, batch.OK, batch.ERROR, batch.EXIT, batch.EXIT
+        ]
+        assert [_r['statements'] for _r in results] == [100, 7, 2, 1, 1]
+        assert (results[2]['error'], results[2]['line']) == (5, 20)
+        with open(self.output_path('END.BAS.OUT'), 'rb') as f:
+            assert f.read() == b' 1  2  3 '
+
+    def test_time_limit(self):
+        """A program that runs or waits too long is stopped."""
+        self._write('LOOP.BAS', b'10 GOTO 10\r\n')
+        self._write('WAIT.BAS', b'10 WHILE INKEY$="": WEND\r\n')
+        with batch.BatchSession(input_streams=None, output_streams=None) as s:
+            for name in ('LOOP.BAS', 'WAIT.BAS'):
+                result = s.run_program(self.output_path(name), time_limit=1)
+                assert result['status'] == batch.TIMEOUT
+                assert 1 <= result['runtime'] < 2
+
+    def test_manifest(self):
+        """Run programs from a manifest across worker processes."""
+        self._write('PROG.BAS', b'10 INPUT A$: PRINT "got ";A$\r\n')
+        self._write('PROG.IN', b'hello\r\n')
+        self._write('BAD.BAS', b'10 PRINT 1\r\n20 GOTO 100\r\n')
+        manifest = self._write(
+            'MANIFEST.TXT',
+            b'# programs\r\n'
+            b'PROG.BAS PROG.IN PROG.OUT\r\n'
+            b'BAD.BAS - BAD.OUT\r\n'
+            b'MISSING.BAS\r\n'
+        )
+        output = io.BytesIO()
+        with stdio.redirect_output(output, 'stdout'):
+            run('--batch=' + manifest, '--batch-workers=2')
+        summary = json.loads(output.getvalue().decode('utf-8'))
+        assert summary['programs'] == 3
+        assert summary['statuses'] == {'ok': 1, 'error': 2}
+        results = summary['results']
+        assert [_r['status'] for _r in results] == ['ok', 'error', 'error']
+        assert [_r['error'] for _r in results] == [None, 8, 52]
+        with open(self.output_path('PROG.OUT'), 'rb') as f:
+            assert f.read() == b'? hello\r\ngot hello\r\n'
+
+    def test_open_files(self):
+        """Files left open by a program are closed and written."""
+        self._write('OPEN.BAS', b'10 OPEN "O",1,"X.TXT": PRINT #1,"HELLO"\r\n20 X=SQR(-1)\r\n')
+        manifest = self._write('MANIFEST.TXT', b'OPEN.BAS\r\n')
+        session_params = {
+            'devices': {b'A': {'path': self.output_path()}}, 'current_device': b'A',
+            'enabled_writes': ['disk'],
+        }
+        summary = batch.run_batch(manifest, session_params, workers=1)
+        assert summary['statuses'] == {'error': 1}
+        with open(self.output_path('X.TXT'), 'rb') as f:
+            assert f.read() == b'HELLO\r\n\x1a'
+
+    def test_bad_settings(self):
+        """Configuration errors are raised rather than retried by the worker pool."""
+        manifest = self._write('MANIFEST.TXT', b'PROG.BAS\r\n')
+        with self.assertRaises(TypeError):
+            batch.run_batch(manifest, {'devices': {b'A': u'/'}}, workers=1)
+
+
+if __name__ == '__main__':
+    run_tests()
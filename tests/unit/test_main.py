@@ -8,6 +8,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import io
 import sys
+import json
 from tempfile import NamedTemporaryFile
 
 from pcbasic import run
@@ -139,6 +140,21 @@ class MainTest(TestCase):
             output = outfile.read()
         assert output == b' 13 \r\n\x1a', repr(output)
 
+    def test_resume_profile(self):
+        """Test resume with execution profile."""
+        with open(self.output_path('PROG.BAS'), 'wb') as f:
+            f.write(b'10 A=A+1\r\n20 SYSTEM\r\n')
+        with stdio.quiet():
+            run(
+                '-n', '--exec=run"z:prog"', '--mount=z:%s' % self.output_path(),
+                '--profile=%s' % self.output_path('first'),
+            )
+            run('--resume', '--keys=run\\r', '-n', '--profile=%s' % self.output_path('resumed'))
+        with open(self.output_path('resumed.json'), 'rb') as f:
+            stats = json.loads(f.read().decode('utf-8'))
+        # hits from before and after resuming
+        assert [(_l['line'], _l['hits']) for _l in stats['lines']] == [(10, 2), (20, 2)]
+
 
 class ConvertTest(TestCase):
     """Unit tests for convert script."""
@@ -98,6 +98,277 @@ class DiskTest(unittest.TestCase):
             s._impl.program.load(MockNonProgramFile())
         # we're not testing anything, just exercising the code path
 
+    def test_load_ascii(self):
+        """Loading and merging an ascii file stores lines as if typed in order."""
+        text = (
+            b'30 PRINT 3\r\n10 PRINT 1\r\n20 PRINT 2\r\n'
+            b'10 PRINT "one"\r\n30\r\n40 GOTO 20\r\n'
+        )
+        with open(self._output_path('PROG.BAS'), 'wb') as f:
+            f.write(text)
+        with Session() as s:
+            s.execute(text.replace(b'\r\n', b'\r'))
+            typed = s._impl.program.bytecode.getvalue()
+            typed_lines = dict(s._impl.program.line_numbers)
+        with Session(devices={b'A': {'path': self._test_dir}}, current_device='A:') as s:
+            s.execute('load "prog"')
+            program = s._impl.program
+            assert program.bytecode.getvalue() == typed
+            assert program.line_numbers == typed_lines
+            assert program.last_stored == 40
+            s.execute('new\n5 PRINT 0\n20 REM\n50 END\nmerge "prog"')
+            s.execute('delete 5\ndelete 50')
+            assert program.bytecode.getvalue() == typed
+        # lines stored before an error are kept
+        with open(self._output_path('PROG.BAS'), 'wb') as f:
+            f.write(b'20 PRINT 2\r\n10 PRINT 1\r\n30\r\n40 END\r\n')
+        with Session(devices={b'A': {'path': self._test_dir}}, current_device='A:') as s:
+            s.execute('load "prog"')
+            assert s.evaluate('ERR') == 8
+            assert sorted(s._impl.program.line_numbers) == [10, 20, 65536]
+
+    def test_program_cache(self):
+        """Plain-text programs are loaded from the program cache."""
+        cache_dir = self._output_path('cache')
+        with open(self._output_path('PROG.BAS'), 'wb') as f:
+            f.write(b''.join(b'%d A=%d\r\n' % (_i, _i) for _i in range(10, 1000, 10)))
+        params = dict(
+            devices={b'A': {'path': self._test_dir}}, current_device='A:',
+            program_cache=cache_dir,
+        )
+        with Session(**params) as s:
+            s.execute('load "prog"')
+            image = s._impl.program.bytecode.getvalue()
+        entries = os.listdir(cache_dir)
+        assert len(entries) == 1
+        with Session(**params) as s:
+            # loading from cache does not tokenise
+            s.start()
+            s._impl.program.tokeniser = None
+            s.execute('load "prog"')
+            program = s._impl.program
+            assert program.bytecode.getvalue() == image
+            assert sorted(program.line_numbers) == list(range(10, 1000, 10)) + [65536]
+            assert program.last_stored == 990
+        # damaged entries are ignored and replaced
+        with open(os.path.join(cache_dir, entries[0]), 'r+b') as f:
+            f.seek(-2, 2)
+            f.write(b'\xff')
+        with Session(**params) as s:
+            s.execute('load "prog"')
+            assert s._impl.program.bytecode.getvalue() == image
+        with Session(**params) as s:
+            s.start()
+            s._impl.program.tokeniser = None
+            s.execute('load "prog"')
+            assert s._impl.program.bytecode.getvalue() == image
+        # least recently used entries are removed to keep within size
+        os.utime(os.path.join(cache_dir, entries[0]), (0, 0))
+        with open(self._output_path('OTHER.BAS'), 'wb') as f:
+            f.write(b''.join(b'%d PRINT %d\r\n' % (_i, _i) for _i in range(100)))
+        with Session(program_cache_size=2, **params) as s:
+            s.execute('load "other"')
+        assert len(os.listdir(cache_dir)) == 1
+        assert entries[0] not in os.listdir(cache_dir)
+        # unusable cache locations are ignored
+        params['program_cache'] = self._output_path('PROG.BAS')
+        with Session(**params) as s:
+            s.execute('load "prog"')
+            assert s._impl.program.bytecode.getvalue() == image
+
+    def test_statement_cache_invalidation(self):
+        """Changed program code is not executed from stale decoded statements."""
+        with Session(allow_code_poke=True) as s:
+            s.execute('10 a=1: b=2\nrun')
+            assert s.get_variable('a!') == 1
+            assert s.get_variable('b!') == 2
+            # replace line
+            s.execute('10 b=3: a=4\nrun')
+            assert s.get_variable('a!') == 4
+            assert s.get_variable('b!') == 3
+            # poke a different variable name into the program code
+            code_start = s._impl.memory.code_start
+            s.execute('poke %d, asc("C")' % (code_start + 5,))
+            s.execute('run')
+            assert s.get_variable('c!') == 3
+            assert s.get_variable('a!') == 4
+            # delete and renumber
+            s.execute('20 d=5\ndelete 10\nrenum 100\nrun')
+            assert s.get_variable('d!') == 5
+            assert s.get_variable('a!') == 0
+
+    def test_get_line_number(self):
+        """Line number lookup by code position."""
+        with Session() as s:
+            s.execute('10 a=1\n20 b=2\n30 c=3')
+            program = s._impl.program
+            assert program.get_line_number(None) == -1
+            assert program.get_line_number(-1) == -1
+            # each line takes 8 bytes
+            assert [program.get_line_number(_pos) for _pos in (0, 7, 8, 15, 16, 23, 24)] == [
+                10, 10, 20, 20, 30, 30, 65536
+            ]
+            # index follows edits
+            s.execute('15 x=0\ndelete 20')
+            assert [program.get_line_number(_pos) for _pos in (0, 8, 16, 24)] == [
+                10, 15, 30, 65536
+            ]
+            s.execute('renum 100, 15')
+            assert program.get_line_number(8) == 100
+
+    def test_block_index(self):
+        """Loop blocks are found again after edits."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 FOR I=1 TO 3: FOR J=1 TO 2: N=N+1: NEXT J, I\n'
+                '20 WHILE K<5: K=K+1: WEND\n'
+                'run'
+            )
+            assert s.get_variable('n!') == 6
+            assert s.get_variable('k!') == 5
+            s.execute('15 FOR J=1 TO 2: M=M+1\n25 NEXT\nrun')
+            assert s.get_variable('m!') == 2
+            s.execute('delete 25\nrun')
+            assert s.evaluate('ERR') == 26
+            s.execute('15\n30 WEND\nrun')
+            assert s.evaluate('ERR') == 30
+            s.execute('20 WHILE K<5: K=K+1\n30\nrun')
+            assert s.evaluate('ERR') == 29
+
+    def test_data_index(self):
+        """READ and RESTORE follow edits to DATA statements."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 FOR I=1 TO 3: RESTORE 40: READ A, B$: T=T+A: NEXT\n'
+                '20 READ C: END\n'
+                '30 DATA 1\n'
+                '40 DATA 2, two: DATA 3\n'
+                'run'
+            )
+            assert s.get_variable('t!') == 6
+            assert s.get_variable('b$') == b'two'
+            assert s.get_variable('c!') == 3
+            s.execute('40 DATA 4, " four"\n50 DATA 5\nrun')
+            assert s.get_variable('b$') == b' four'
+            assert s.get_variable('c!') == 5
+            s.execute('50\nrun')
+            assert s.evaluate('ERR') == 4
+
+    def test_jump_references(self):
+        """RENUM rewrites line number references only, following edits."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 ON ERROR GOTO 0: A=3598: B=14: GOTO 30\n'
+                '20 REM GOTO 10\n'
+                '30 IF A THEN 10 ELSE GOSUB 20: RESTORE 50\n'
+                '40 GOTO 0\n'
+            )
+            program = s._impl.program
+            assert len(program.get_jump_references()) == 6
+            s.execute('delete 20\nrenum 100, 10, 5\ncls\nlist')
+            listing = [b''.join(_row).rstrip() for _row in s.get_chars()[:3]]
+            assert listing == [
+                b'100 ON ERROR GOTO 0: A=3598: B=14: GOTO 105',
+                b'105 IF A THEN 100 ELSE GOSUB 20: RESTORE 50',
+                b'110 GOTO 0',
+            ]
+            # the index is kept up to date rather than rebuilt
+            assert program.get_jump_references() is program._jump_refs
+            s.execute('cls\nrenum')
+            report = [b''.join(_row).rstrip() for _row in s.get_chars()[:3]]
+            assert report == [
+                b'Undefined line 20 in 105',
+                b'Undefined line 50 in 105',
+                b'Undefined line 0 in 110',
+            ]
+            # token values in string literals are not references, nor do they start a comment
+            s.execute('new\n10 A$="\x0e\x8f": GOTO 30\n20 END\n30 B=1\nrenum\nrun')
+            assert s.get_variable('b!') == 1
+
+    def test_number_literal_pool(self):
+        """Decoded number literals are shared but follow changes to the program code."""
+        with Session(input_streams=None, output_streams=None, allow_code_poke=True) as s:
+            s.execute('10 FOR I=1 TO 3: A=A+1.5: B=-A: NEXT: C=20\nrun')
+            assert s.get_variable('a!') == 4.5
+            assert s.get_variable('b!') == -4.5
+            s.execute('run')
+            assert s.get_variable('a!') == 4.5
+            # 20 is stored as a byte token at the end of the line
+            code_start = s._impl.memory.code_start
+            s.execute('poke %d, 30' % (code_start + s._impl.program.line_numbers[65536] - 1,))
+            s.execute('run')
+            assert s.get_variable('c!') == 30
+            s.execute('10 FOR I=1 TO 3: A=A+2.5: NEXT\nrun')
+            assert s.get_variable('a!') == 7.5
+
+    def test_scalar_slots(self):
+        """Resolved variable references follow DEFtype, CLEAR and NEW."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 GOSUB 100: DEFINT A: GOSUB 100: GOSUB 100: PRINT A\n'
+                '20 CLEAR: GOSUB 100: C$="x": C$=C$+"y": END\n'
+                '100 A=A+1: RETURN\n'
+                'run'
+            )
+            assert b''.join(s.get_chars()[0]).rstrip() == b' 2'
+            # after CLEAR, DEFINT no longer holds
+            assert s.get_variable('a!') == 1
+            assert s.get_variable('a%') == 0
+            assert s.get_variable('c$') == b'xy'
+            s.execute('new')
+            s.execute('A%=3: B=A%')
+            assert s.get_variable('b!') == 3
+
+    def test_fast_math(self):
+        """Fast math approximates MBF arithmetic and keeps its errors and types."""
+        program = (
+            '10 A=1.1: B#=2.2#: C%=3: D$="x"\n'
+            '20 FOR I=1 TO 3: X=(A+C%)*2-A/3: Y#=B#*B#+-C%: Z=C%^2+A^0.5: NEXT\n'
+            '30 P=1E+30*1E+30/1E+30: Q=1/(A-A): E$=D$+D$: F%=+C%: G=(((I)))\n'
+            'run'
+        )
+        results = []
+        for fast_math in (False, True):
+            with Session(input_streams=None, output_streams=None, fast_math=fast_math) as s:
+                s.execute(program)
+                results.append([
+                    s.get_variable(_name)
+                    for _name in ('x!', 'y#', 'z!', 'p!', 'q!', 'e$', 'f%', 'g!')
+                ])
+                output = [b''.join(_row).rstrip() for _row in s.get_chars()[:2]]
+                assert output == [b'Overflow', b'Division by zero']
+        exact, fast = results
+        for exact_value, fast_value in zip(exact[:3], fast[:3]):
+            assert abs(exact_value - fast_value) <= abs(exact_value) * 1e-6
+        assert exact[3:] == fast[3:]
+        assert fast[3:] == [170141168.0, 1.7014117331926443e+38, b'xx', 3, 4]
+
+    def test_compiled_expression_redefined_function(self):
+        """Compiled expressions follow a change in the syntax of a user function."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 DEF FNA=5: GOSUB 100\n'
+                '20 DEF FNA(X)=X*10: GOSUB 100\n'
+                '30 END\n'
+                '100 PRINT 1+FNA (2)*3;: RETURN\n'
+                'run'
+            )
+            assert b''.join(s.get_chars()[0]).rstrip() == b' 6  6  61'
+
+    def test_compiled_expression_errors(self):
+        """Compiled expressions raise errors at the same point."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 ON ERROR GOTO 100\n'
+                '20 FOR I=1 TO 3: A$=MID$("xyz", I): B=I+VAL(A$)+A$: NEXT\n'
+                '30 END\n'
+                '100 N=N+1: E=ERR: RESUME NEXT\n'
+                'run'
+            )
+            assert s.get_variable('n!') == 3
+            assert s.get_variable('e!') == 13
+            assert s.get_variable('b!') == 0
+
 
 if __name__ == '__main__':
     unittest.main()
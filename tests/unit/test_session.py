@@ -8,8 +8,10 @@ This file is released under the GNU GPL version 3 or later.
 
 import os
 import io
+import json
 
 from pcbasic import Session, run
+from pcbasic.basic.base import signals, scancode, error
 from tests.unit.utils import TestCase, run_tests
 
 
@@ -326,6 +328,130 @@ class SessionTest(TestCase):
                 [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]
             ]
 
+    def test_event_poll_interval(self):
+        """Event traps and Break are handled with a long event poll interval."""
+        with Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000000, 0)
+            ) as s:
+            s.execute('10 ON TIMER(1) GOSUB 100: TIMER ON\n20 IF N=0 GOTO 20\n30 END\n100 N=1: RETURN')
+            s.execute('run')
+            assert s.get_variable('N!') == 1
+        with Session(
+                input_streams=None, output_streams=None, event_poll_interval=(1000000, 0)
+            ) as s:
+            s.execute('10 GOTO 10')
+            s._impl.queues.inputs.put(
+                signals.Event(signals.KEYB_DOWN, (u'', scancode.BREAK, [scancode.CTRL]))
+            )
+            s.execute('run')
+            assert self.get_text_stripped(s)[:2] == [b'^C', b'Break\xff']
+
+    def test_profile(self):
+        """Profile counts lines, keywords and GOSUB stacks."""
+        with Session(input_streams=None, output_streams=None) as s:
+            assert s.get_profile() is None
+        with Session(profile=True, input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 FOR I=1 TO 3: GOSUB 100: NEXT\n20 END\n'
+                '100 A=A+1: GOSUB 200\n110 RETURN\n200 RETURN\n'
+            )
+            s.execute('print 1')
+            s.execute('run')
+            stats = s.get_profile()
+            lines = {_rec['line']: _rec for _rec in stats['lines']}
+            assert sorted(lines) == [10, 20, 100, 110, 200]
+            # NEXT jumps back into line 10, RETURN back into line 100
+            assert [lines[_line]['hits'] for _line in (10, 100, 110, 200)] == [1, 3, 3, 3]
+            assert [lines[_line]['statements'] for _line in (10, 100, 110, 200)] == [7, 6, 3, 3]
+            keywords = {_rec['keyword']: _rec['statements'] for _rec in stats['keywords']}
+            assert keywords == {
+                'FOR': 1, 'GOSUB': 6, 'LET': 3, 'NEXT': 3, 'RETURN': 6, 'END': 1
+            }
+            collapsed = s.get_profile('collapsed').splitlines()
+            assert [_line.rsplit(' ', 1)[0] for _line in collapsed] == [
+                'main;10', 'main;20', 'main;GOSUB 100;100', 'main;GOSUB 100;110',
+                'main;GOSUB 100;GOSUB 200;200',
+            ]
+            assert s.get_profile('report').startswith('  LINE')
+            assert json.loads(s.get_profile('json')) == json.loads(json.dumps(stats))
+
+    def test_garbage_stats(self):
+        """Garbage collection only moves strings below the highest gap."""
+        with Session(input_streams=None, output_streams=None) as s:
+            assert s.get_garbage_stats() == {u'collections': 0, u'bytes_moved': 0, u'time': 0}
+            s.execute(
+                '10 DIM A$(100)\n'
+                '20 FOR I=0 TO 100: A$(I)=STRING$(10, 65+I MOD 26): NEXT\n'
+                '30 X=FRE(""): A$(99)="": Y=FRE("")\n'
+            )
+            s.execute('run')
+            stats = s.get_garbage_stats()
+            assert stats[u'collections'] == 2
+            # strings are stored downwards, so only A$(100) moves up into the gap left by A$(99)
+            assert stats[u'bytes_moved'] == 10
+            assert stats[u'time'] >= 0
+            assert s.get_variable('A$()')[98:] == [b'U' * 10, b'', b'W' * 10]
+            assert s.get_variable('X!') == 58873
+            assert s.get_variable('Y!') == 58875
+
+    def test_garbage_roots(self):
+        """Only string array elements assigned a non-empty string are garbage collection roots."""
+        with Session(input_streams=None, output_streams=None) as s:
+            s.execute(
+                '10 DIM A$(100), B$(100)\n'
+                '20 FOR I=0 TO 100: X=LEN(A$(I)): NEXT\n'
+                '30 A$(1)="a": A$(2)="b": A$(3)="c": A$(2)="": SWAP A$(3), B$(5)\n'
+            )
+            s.execute('run')
+            # reads don't add roots; emptied elements are dropped
+            roots = s._impl.memory.arrays.get_strings()
+            assert sorted(bytes(_view) for _view in roots) == sorted(
+                bytes(s.view_array(_name)[0][_offset:_offset+3])
+                for _name, _offset in ((b'A$', 3), (b'B$', 15))
+            )
+            s.view_array(b'A$')
+            assert len(s._impl.memory.arrays.get_strings()) == 2
+            assert s.evaluate('A$(1)+B$(5)') == b'ac'
+
+    def test_session_bulk_array(self):
+        """Test Session.get_array, Session.set_array and Session.view_array."""
+        with Session() as s:
+            s.execute('DIM B%(2, 1): B%(1, 0) = 5: B%(2, 1) = -1')
+            # first index varies fastest
+            assert s.get_array('B%()') == [0, 5, 0, 0, 0, -1]
+            buf, shape, base = s.view_array(b'B%')
+            assert (shape, base) == ((3, 2), 0)
+            assert bytes(buf[2:4]) == b'\x05\x00'
+            # floats round-trip as through set_variable
+            s.set_array('A!', [0.1 * _i for _i in range(100)], shape=(100,))
+            assert s.get_array('A!()') == s.get_variable('A!()')
+            assert s.evaluate(b'A!(10)') == s.get_variable('A!()')[10]
+            s.execute('DIM C!(99)')
+            s.set_variable('C!()', [0.1 * _i for _i in range(100)])
+            assert s.get_array('C!') == s.get_array('A!')
+            # out-of-range values overflow to the signed maximum, as through set_variable
+            s.execute('CLS')
+            s.set_array('A!', [1e39, -1e39] + [1.] * 98)
+            assert s.get_array('A!')[:3] == [1.7014117331926443e+38, -1.7014117331926443e+38, 1.]
+            assert [b''.join(_row).rstrip() for _row in s.get_chars()[:3]] == [b'Overflow', b'Overflow', b'']
+            s.set_variable('C!()', [1e39, -1e39] + [1.] * 98)
+            assert s.get_array('C!') == s.get_array('A!')
+            # strings, including unicode converted to the codepage
+            s.execute('DIM S$(2)')
+            s.set_array('S$', [b'ab', u'\xe9', b''])
+            assert s.get_array('S$') == [b'ab', b'\x82', b'']
+            assert s.evaluate(b'S$(0) + S$(1)') == b'ab\x82'
+            # length must match the dimensions
+            with self.assertRaises(ValueError):
+                s.set_array('B%', [1, 2])
+            with self.assertRaises(error.BASICError):
+                s.set_array('B%', [1, 2, 3, 4, 5, 40000])
+            # undefined arrays
+            assert s.get_array('X#') == []
+            assert s.view_array('X#') is None
+            with self.assertRaises(ValueError):
+                s.get_array('X')
+
 
 from pcbasic.basic import iostreams
 from pcbasic.basic.codepage import Codepage
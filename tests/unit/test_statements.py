@@ -6,10 +6,12 @@ unit tests for PC-BASIC specific behaviour of statements
 This file is released under the GNU GPL version 3 or later.
 """
 
+import struct
 from io import BytesIO
 from tempfile import NamedTemporaryFile
 
 from pcbasic import Session, run
+from pcbasic.basic.devices import formatter
 from tests.unit.utils import TestCase, run_tests
 
 
@@ -52,5 +54,85 @@ class StatementTest(TestCase):
             s.execute('wait &h60, 255, 255')
             assert self.get_text_stripped(s)[0] == b''
 
+    def test_for_next(self):
+        """Test integer-counted FOR loops behave like loops on BASIC numbers."""
+        program = b"""
+            10 ON ERROR GOTO 200
+            20 FOR I%=32765 TO 32767: PRINT I%;: NEXT: PRINT I%
+            30 FOR I%=-32766 TO -32768 STEP -1: PRINT I%;: NEXT: PRINT I%
+            40 FOR I%=5 TO 1 STEP -2: PRINT I%;: NEXT: PRINT I%
+            50 FOR I%=1 TO 3 STEP 0: PRINT I%;: I%=I%+1: IF I%<5 THEN NEXT
+            55 PRINT I%
+            60 FOR I%=1 TO 10: PRINT I%;: I%=I%*2: NEXT: PRINT I%
+            70 FOR I%=1 TO 0: PRINT "x";: NEXT: PRINT I%
+            80 FOR A!=1 TO 3: PRINT A!;: A!=A!+0.5: NEXT: PRINT A!
+            90 FOR A!=16777213! TO 16777219! STEP 2: PRINT A!;: NEXT: PRINT A!
+            100 FOR A!=-2 TO -10 STEP -3: PRINT A!;: NEXT: PRINT A!
+            110 END
+            200 PRINT "error"; ERR; ERL: RESUME NEXT
+        """
+        expected = [
+            b' 32765  32766  32767 error 6  20',
+            b' 32767',
+            b'-32766 -32767 -32768 error 6  30',
+            b'-32768',
+            b' 5  3  1 -1',
+            b' 1  2',
+            b' 1  3  7  15',
+            b' 2',
+            b' 1  2.5  4',
+            b' 1.677721E+07  1.677722E+07  1.677722E+07  1.677722E+07  1.677722E+07',
+            b'-2 -5 -8 -11',
+        ]
+        outputs = []
+        for integral in (True, False):
+            with Session() as s:
+                s.execute(b'')
+                if not integral:
+                    # force all loops through Value arithmetic
+                    s._impl.interpreter._get_integral_loop = lambda *args: None
+                s.execute(program)
+                s.execute(b'run')
+                outputs.append(self.get_text_stripped(s)[:len(expected)])
+        assert outputs[0] == expected, outputs[0]
+        assert outputs[1] == expected, outputs[1]
+
+    def test_print_using(self):
+        """Test PRINT USING with compiled format strings."""
+        with Session() as s:
+            # run twice to use the cached format strings
+            for _ in range(2):
+                s.execute(b'cls: print using "+##.#_#x"; 1.25; 123; -1')
+                assert self.get_text_stripped(s)[0] == b' +1.3#x%+123.0#x -1.0#x'
+                s.execute(b'cls: print using "(\\ \\) "; "abcdef"; "x";')
+                assert self.get_text_stripped(s)[0] == b'(abc) (x  )'
+                s.execute(b'cls: print using "&=!"; "one"; "two"; "three"')
+                assert self.get_text_stripped(s)[0] == b'one=tthree='
+                s.execute(b'cls: print using "ab"; 1')
+                assert self.get_text_stripped(s)[:2] == [b'ab', b'Illegal function call\xff']
+            # the cache is bounded
+            for i in range(formatter.USING_CACHE_SIZE + 1):
+                s.execute(b'print using "%d#"; 1' % (i,))
+            assert len(formatter._using_cache) == formatter.USING_CACHE_SIZE
+            assert b'0#' not in formatter._using_cache
+            assert b'1#' in formatter._using_cache
+
+    def test_peek_variables(self):
+        """Test PEEK and VARPTR$ lookups into variables, arrays and strings."""
+        with Session(peek_values={}) as s:
+            s.execute(
+                b'10 DIM A%(3), B%(3): A%(2)=258: B%(1)=772: S$="hello": T$=S$+"!"\n'
+                b'20 P=VARPTR(T$): Q=PEEK(P+1)+256*PEEK(P+2)\n'
+            )
+            s.execute(b'run')
+            s.execute(b'cls: print peek(varptr(a%(2))); peek(varptr(b%(1))); peek(varptr(b%(1))+1)')
+            assert self.get_text_stripped(s)[0] == b' 2  4  3'
+            s.execute(b'cls: print peek(q); peek(q+5)')
+            assert self.get_text_stripped(s)[0] == b' 104  33'
+            memory = s._impl.memory
+            for name, indices, value in ((b'A%', [2], 258), (b'B%', [1], 772), (b'T$', [], b'hello!')):
+                varptr_str = struct.pack('<BH', 2 if indices else 3, memory.varptr(name, indices))
+                assert memory.get_value_for_varptrstr(varptr_str).to_value() == value
+
 if __name__ == '__main__':
     run_tests()
@@ -6,6 +6,8 @@ unit tests for values.values
 This file is released under the GNU GPL version 3 or later.
 """
 
+import random
+
 from pcbasic import Session
 from pcbasic.basic.values import values
 from pcbasic.basic.values.numbers import Integer, Single, Double
@@ -14,6 +16,25 @@ from pcbasic.basic.base import error
 from tests.unit.utils import TestCase, run_tests
 
 
+def _div_den_bitwise(float_type, lden, rden):
+    """Reference denormalised divide, one quotient bit at a time."""
+    lexp, lman, lneg = lden
+    rexp, rman, rneg = rden
+    lneg = (lneg != rneg)
+    lexp -= rexp - float_type._bias - 8
+    work_man = lman
+    lman = 0
+    lexp += 1
+    while (rman > 0):
+        lman <<= 1
+        lexp -= 1
+        if work_man > rman:
+            work_man -= rman
+            lman += 1
+        rman >>= 1
+    return lexp, lman, lneg
+
+
 class ValuesTest(TestCase):
     """Unit tests for values.values module."""
 
@@ -246,6 +267,47 @@ class ValuesTest(TestCase):
         assert four.idiv(two).eq(two)
         assert zero.idiv(two).eq(vm.new_single().from_int(0))
 
+    def test_float_div_den(self):
+        """Test denormalised division against bitwise long division."""
+        vm = values.Values(None, double_math=False)
+        rng = random.Random(9)
+        for new_float in (vm.new_single, vm.new_double):
+            value = new_float()
+            # all mantissa bits set, none set, and random ones
+            mantissas = [value._den_mask, value._den_upper - 0x100] + [
+                rng.getrandbits(8 * value.size) & value._carrymask | value._den_mask
+                for _ in range(5000)
+            ]
+            for lman in mantissas:
+                rman = rng.choice(mantissas)
+                lden = rng.randint(1, 255), lman, rng.random() < 0.5
+                rden = rng.randint(1, 255), rman, rng.random() < 0.5
+                assert value._div_den(lden, rden) == _div_den_bitwise(value, lden, rden)
+
+    def test_float_decimal_scaling(self):
+        """Test scaling by ten against denormalised divide and add."""
+        vm = values.Values(None, double_math=False)
+        rng = random.Random(10)
+        for new_float in (vm.new_single, vm.new_double):
+            value = new_float()
+            ten = new_float().from_bytes(value._ten)._denormalise()
+            for _ in range(5000):
+                # include carry bits, as left by earlier steps
+                man = rng.getrandbits(8 * value.size) | value._den_mask
+                den = rng.randint(1, 255), man, rng.random() < 0.5
+                exp, man, neg = value._div_den(den, ten)
+                while man < value._den_mask:
+                    exp -= 1
+                    man <<= 1
+                assert value._div10_den(den) == (exp, man, neg)
+                exp, man, neg = den
+                assert value._mul10_den(den) == value._add_den((exp+1, man, neg), (exp+3, man, neg))
+            # out of range exponents
+            assert value.from_decimal(1, -300).is_zero()
+            with self.assertRaises(OverflowError):
+                value.from_decimal(-1, 300)
+            assert value.to_bytes() == value.neg_max
+
     def test_float_ipow_int(self):
         """Test in-place power operation on floats."""
         vm = values.Values(None, double_math=False)
@@ -292,6 +354,36 @@ class ValuesTest(TestCase):
         vm = values.Values(None, double_math=False)
         assert vm.new_single().from_value(0).to_str_fixed(3, False, False) == b'000'
 
+    def test_free_list(self):
+        """Released temporaries are recycled with a zeroed buffer."""
+        vm = values.Values(None, double_math=False)
+        temp = vm.new_single().from_int(5)
+        vm.release(temp)
+        assert vm.new_single() is temp
+        assert temp.to_value() == 0
+        # a recycled number is not handed out as another type
+        vm.release(temp)
+        assert vm.new_double() is not temp
+        assert vm.new_single().from_int(3).clone() is not temp
+        with self.assertRaises(AttributeError):
+            temp.attribute = None
+
+    def test_free_list_expressions(self):
+        """Recycling intermediate results does not affect variables or results."""
+        with Session() as s:
+            s.execute(
+                '10 FOR I=1 TO 3: A=-(I+1)*2: B=+A: C=(A+1)*(B-1): D=-B: NEXT\n'
+                '20 X#=((1#+2)*3-4)/5: Y%=NOT(1+2): Z=(1=1)*(2<3)+(2>1 AND 3)\n'
+                'run'
+            )
+            assert s.get_variable('a!') == -8
+            assert s.get_variable('b!') == -8
+            assert s.get_variable('c!') == 63
+            assert s.get_variable('d!') == 8
+            assert s.get_variable('x#') == 1
+            assert s.get_variable('y%') == -4
+            assert s.get_variable('z!') == 4
+
 
 if __name__ == '__main__':
     run_tests()